@@ -0,0 +1,50 @@
+import math
+
+# Latency bookkeeping shared by the bench* management commands.
+
+# Metrics where a larger value is a regression; throughput is checked the other way
+LATENCY_METRICS = ("p50_ms", "p95_ms", "p99_ms")
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(len(sorted_values) * pct / 100))
+    return sorted_values[rank - 1]
+
+
+def summarize(label, latencies, elapsed, errors=0):
+    """Latency percentiles (ms) and throughput for one batch of timed requests."""
+    latencies = sorted(latencies)
+    return {
+        "name": label,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare summaries with a baseline run by name. Returns one message per
+    regression: a latency percentile more than `tolerance` (a fraction) above
+    the baseline, or throughput more than `tolerance` below it.
+    """
+    previous = {result["name"]: result for result in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get(result["name"])
+        if before is None:
+            continue
+        for metric in LATENCY_METRICS:
+            if before.get(metric) and result[metric] > before[metric] * (1 + tolerance):
+                regressions.append(f"{result['name']}: {metric} {before[metric]} -> {result[metric]}")
+        if before.get("throughput_rps") and result["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{result['name']}: throughput_rps {before['throughput_rps']} -> {result['throughput_rps']}"
+            )
+    return regressions
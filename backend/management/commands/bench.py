@@ -0,0 +1,210 @@
+import datetime
+import io
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+
+from backend.benchmarks import compare, summarize
+from db_connection import get_client, get_db
+from learning_paths.mongodb_services import stamp_new
+from users.models import BaseUser, search_keys
+
+BENCH_PASSWORD = "bench-password"
+
+# Scenario name -> the request it times; requests are built in scenarios()
+ENDPOINTS = {
+    "login": "POST /api/login/",
+    "roster": "GET /api/students/",
+    "path_list": "GET /api/learning-paths/?limit=50",
+    "path_detail": "GET /api/learning-paths/<pk>/",
+    "path_put": "PUT /api/learning-paths/<pk>/",
+    "update_class_id": "POST /api/update_class_id/",
+}
+
+
+def make_learning_path(units, topics, completed_every=2):
+    return [
+        {
+            "unitTitle": f"Unit {u}",
+            "topics": [{"name": f"Topic {u}.{t}", "completed": t % completed_every == 0} for t in range(topics)],
+        }
+        for u in range(units)
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a scratch MongoDB database, drive the main endpoints through the full Django stack "
+        "at a given concurrency, and report p50/p95/p99 latency and throughput per endpoint. "
+        "Results can be written to JSON and compared with a stored baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--endpoints", default=",".join(ENDPOINTS),
+                            help=f"Comma-separated subset of: {', '.join(ENDPOINTS)}.")
+        parser.add_argument("--requests", type=int, default=500, help="Timed requests per endpoint.")
+        parser.add_argument("--warmup", type=int, default=20, help="Untimed requests per endpoint.")
+        parser.add_argument("--concurrency", type=int, default=16)
+        parser.add_argument("--students", type=int, default=1000)
+        parser.add_argument("--paths", type=int, default=200)
+        parser.add_argument("--classes", type=int, default=20)
+        parser.add_argument("--database", help="Scratch database (default: <db_name>_bench). Dropped afterwards.")
+        parser.add_argument("--keep", action="store_true", help="Keep the scratch database.")
+        parser.add_argument("--output", help="Write the results to this JSON file.")
+        parser.add_argument("--baseline", help="Results JSON from an earlier run to compare with.")
+        parser.add_argument("--tolerance", type=float, default=0.2,
+                            help="Allowed slowdown as a fraction of the baseline (default 0.2).")
+        parser.add_argument("--fail-on-regression", action="store_true")
+
+    def handle(self, *args, **options):
+        endpoints = [name for name in options["endpoints"].split(",") if name]
+        unknown = set(endpoints) - set(ENDPOINTS)
+        if unknown:
+            raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}.")
+        database = options["database"] or settings.MONGO_CONFIG["db_name"] + "_bench"
+        if database == settings.MONGO_CONFIG["db_name"]:
+            raise CommandError("The benchmark seeds and drops its database; point it at a scratch database.")
+        baseline = None
+        if options["baseline"]:
+            with open(options["baseline"]) as f:
+                baseline = json.load(f)
+
+        # Every view resolves the database from settings per request, so this redirects the whole app
+        overrides = {
+            "MONGO_CONFIG": {**settings.MONGO_CONFIG, "db_name": database},
+            "ALLOWED_HOSTS": [*settings.ALLOWED_HOSTS, "testserver"],
+        }
+        with override_settings(**overrides):
+            try:
+                call_command("mongo_migrate", stdout=io.StringIO())
+                fixtures = self.seed(options["students"], options["paths"], options["classes"])
+                scenarios = self.scenarios(fixtures)
+                results = []
+                for name in endpoints:
+                    result = self.run_endpoint(name, scenarios[name], options)
+                    results.append(result)
+                    self.stdout.write(
+                        f"{name:>16}: {result['requests']} requests, {result['errors']} errors, "
+                        f"{result['throughput_rps']} req/s, p50 {result['p50_ms']} ms, "
+                        f"p95 {result['p95_ms']} ms, p99 {result['p99_ms']} ms"
+                    )
+            finally:
+                if not options["keep"]:
+                    get_client().drop_database(database)
+
+        report = {
+            "run_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "options": {key: options[key] for key in ("requests", "concurrency", "students", "paths", "classes")},
+            "results": results,
+        }
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}.")
+
+        if baseline is not None:
+            regressions = compare(results, baseline["results"], options["tolerance"])
+            if not regressions:
+                self.stdout.write(self.style.SUCCESS(f"No regressions against {options['baseline']}."))
+                return
+            for regression in regressions:
+                self.stdout.write(self.style.WARNING(f"Regression: {regression}"))
+            if options["fail_on_regression"]:
+                raise CommandError(f"{len(regressions)} regression(s) against {options['baseline']}.")
+
+    def seed(self, students, paths, classes):
+        """Insert synthetic students and learning paths; returns what the scenarios address."""
+        db = get_db()
+        password = make_password(BENCH_PASSWORD)  # Hashed once; logins still verify a real PBKDF2 hash
+        class_ids = [f"BENCH-{i}" for i in range(max(classes, 1))]
+
+        student_docs = []
+        for i in range(students):
+            student = {
+                "role": "student",
+                "name": f"Bench Student {i}",
+                "email": f"student{i}@bench.example",
+                "password": password,
+                "enrollmentNumber": f"BENCH{i:06d}",
+                "department": ("CS", "EE", "ME")[i % 3],
+                "classID": class_ids[i % len(class_ids)],
+            }
+            student["searchKeys"] = search_keys(student)
+            student_docs.append(student)
+        if student_docs:
+            db["students"].insert_many(student_docs)
+
+        path_docs = [
+            stamp_new({
+                "title": f"Bench path {i}",
+                "classID": class_ids[i % len(class_ids)],
+                "learningPath": make_learning_path(5, 8),
+                "progress": 0.5,
+                "completedTopics": 20,
+                "totalTopics": 40,
+            })
+            for i in range(paths)
+        ]
+        path_ids = [str(pk) for pk in db["learning_paths"].insert_many(path_docs).inserted_ids] if path_docs else []
+
+        # Tokens are minted directly so update_class_id measures the endpoint, not logins
+        tokens = [
+            BaseUser("student", s["name"], s["email"], s["password"], s["_id"]).generate_jwt_token()["access"]
+            for s in student_docs[:100]
+        ]
+        if not student_docs or not path_ids:
+            raise CommandError("The benchmark needs at least one student and one learning path.")
+        return {"emails": [s["email"] for s in student_docs], "path_ids": path_ids,
+                "class_ids": class_ids, "tokens": tokens}
+
+    def scenarios(self, fixtures):
+        """Endpoint name -> function(client, i) sending the i-th request."""
+        emails, path_ids = fixtures["emails"], fixtures["path_ids"]
+        class_ids, tokens = fixtures["class_ids"], fixtures["tokens"]
+        put_body = json.dumps({"learningPath": make_learning_path(5, 8, completed_every=3)})
+        return {
+            "login": lambda client, i: client.post(
+                "/api/login/", {"email": emails[i % len(emails)], "password": BENCH_PASSWORD},
+                content_type="application/json"),
+            "roster": lambda client, i: client.get("/api/students/"),
+            "path_list": lambda client, i: client.get("/api/learning-paths/", {"limit": 50}),
+            "path_detail": lambda client, i: client.get(f"/api/learning-paths/{path_ids[i % len(path_ids)]}/"),
+            "path_put": lambda client, i: client.put(
+                f"/api/learning-paths/{path_ids[i % len(path_ids)]}/", put_body, content_type="application/json"),
+            "update_class_id": lambda client, i: client.post(
+                "/api/update_class_id/", {"classID": class_ids[i % len(class_ids)]},
+                content_type="application/json", HTTP_AUTHORIZATION=f"Bearer {tokens[i % len(tokens)]}"),
+        }
+
+    def run_endpoint(self, name, send, options):
+        local = threading.local()
+        errors = 0
+        errors_lock = threading.Lock()
+
+        def one(i):
+            nonlocal errors
+            client = getattr(local, "client", None)
+            if client is None:
+                client = local.client = Client(raise_request_exception=False)  # 500s count as errors
+            started = time.perf_counter()
+            response = send(client, i)
+            elapsed = time.perf_counter() - started
+            if response.status_code >= 400:
+                with errors_lock:
+                    errors += 1
+            return elapsed
+
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+            list(pool.map(one, range(options["warmup"])))
+            errors = 0
+            started = time.perf_counter()
+            latencies = list(pool.map(one, range(options["requests"])))
+            elapsed = time.perf_counter() - started
+        return summarize(name, latencies, elapsed, errors)
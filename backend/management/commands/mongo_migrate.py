@@ -0,0 +1,55 @@
+import datetime
+import importlib
+import pkgutil
+
+from django.core.management.base import BaseCommand, CommandError
+
+from db_connection import get_db
+from backend import mongo_migrations
+
+MIGRATIONS_COLLECTION = "mongo_migrations"
+
+
+def discover_migrations():
+    """Return (version, module name) pairs for every migration file, oldest first."""
+    names = sorted(m.name for m in pkgutil.iter_modules(mongo_migrations.__path__))
+    return [(name.split("_", 1)[0], name) for name in names]
+
+
+class Command(BaseCommand):
+    help = "Apply pending MongoDB migrations (indexes, backfills) and record them in the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--list", action="store_true", help="Show migrations and whether they are applied.")
+        parser.add_argument("--fake", action="store_true", help="Mark pending migrations as applied without running them.")
+
+    def handle(self, *args, **options):
+        db = get_db()
+        applied = {doc["_id"] for doc in db[MIGRATIONS_COLLECTION].find({}, {"_id": 1})}
+        migrations = discover_migrations()
+
+        if options["list"]:
+            for version, name in migrations:
+                mark = "X" if version in applied else " "
+                self.stdout.write(f"[{mark}] {name}")
+            return
+
+        pending = [(version, name) for version, name in migrations if version not in applied]
+        if not pending:
+            self.stdout.write("No MongoDB migrations to apply.")
+            return
+
+        for version, name in pending:
+            self.stdout.write(f"Applying {name}...", ending=" ")
+            if not options["fake"]:
+                module = importlib.import_module(f"{mongo_migrations.__name__}.{name}")
+                try:
+                    module.apply(db)
+                except Exception as e:
+                    raise CommandError(f"Migration {name} failed: {e}")
+            db[MIGRATIONS_COLLECTION].update_one(
+                {"_id": version},
+                {"$set": {"name": name, "applied_at": datetime.datetime.now(datetime.timezone.utc)}},
+                upsert=True,
+            )
+            self.stdout.write(self.style.SUCCESS("FAKED" if options["fake"] else "OK"))
@@ -0,0 +1,125 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Run in a fresh interpreter: load the WSGI/ASGI application and its URLconf, which is what a
+# worker does before it can serve its first request, and report whether a Mongo client was made.
+BOOT_SCRIPT = """
+import json, os, time
+started = time.perf_counter()
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+import backend.{entry} as entry
+from django.urls import get_resolver
+get_resolver().url_patterns
+import db_connection
+print(json.dumps({{"boot_ms": (time.perf_counter() - started) * 1000,
+                  "mongo_client_created": db_connection._client is not None}}))
+"""
+
+
+def parse_importtime(stderr):
+    """{module: (self ms, cumulative ms)} from `python -X importtime` output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us) / 1000, int(cumulative_us) / 1000)
+    return modules
+
+
+class Command(BaseCommand):
+    help = (
+        "Boot the application in fresh interpreters with -X importtime and report the slowest "
+        "modules, the time spent per top-level package and the total cold-start time of a worker, "
+        "checked against STARTUP['cold_start_target_ms']."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to boot (default 5).")
+        parser.add_argument("--limit", type=int, default=20, help="Modules to list.")
+        parser.add_argument("--sort", choices=("self", "cumulative"), default="self",
+                            help="Rank modules by their own import time (default) or including their imports.")
+        parser.add_argument("--asgi", action="store_true", help="Boot backend.asgi instead of backend.wsgi.")
+        parser.add_argument("--target-ms", type=float,
+                            help="Cold-start target (default: STARTUP['cold_start_target_ms']).")
+        parser.add_argument("--output", help="Write the results to this JSON file.")
+        parser.add_argument("--fail-over-target", action="store_true")
+
+    def handle(self, *args, **options):
+        if options["runs"] < 1:
+            raise CommandError("--runs must be at least 1.")
+        target_ms = options["target_ms"] or settings.STARTUP["cold_start_target_ms"]
+        script = BOOT_SCRIPT.format(entry="asgi" if options["asgi"] else "wsgi")
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "backend.settings")}
+
+        wall_ms, boot_ms, runs = [], [], []
+        client_created = False
+        for _ in range(options["runs"]):
+            started = time.perf_counter()
+            result = subprocess.run([sys.executable, "-X", "importtime", "-c", script], cwd=settings.BASE_DIR,
+                                    env=env, capture_output=True, text=True)
+            wall_ms.append((time.perf_counter() - started) * 1000)
+            if result.returncode:
+                raise CommandError(f"The application failed to boot:\n{result.stderr[-2000:]}")
+            booted = json.loads(result.stdout.strip().splitlines()[-1])
+            boot_ms.append(booted["boot_ms"])
+            client_created |= booted["mongo_client_created"]
+            runs.append(parse_importtime(result.stderr))
+
+        # Median per module across runs, so one slow run does not skew the ranking
+        modules = {
+            name: tuple(statistics.median(run[name][i] for run in runs if name in run) for i in (0, 1))
+            for name in runs[0]
+        }
+        packages = {}
+        for name, (self_ms, _) in modules.items():
+            package = name.split(".")[0]
+            packages[package] = packages.get(package, 0.0) + self_ms
+
+        column = 0 if options["sort"] == "self" else 1
+        slowest = sorted(modules.items(), key=lambda item: item[1][column], reverse=True)[:options["limit"]]
+        self.stdout.write(f"{'self ms':>9} {'cumul. ms':>10}  module")
+        for name, (self_ms, cumulative_ms) in slowest:
+            self.stdout.write(f"{self_ms:>9.1f} {cumulative_ms:>10.1f}  {name}")
+        self.stdout.write("")
+        self.stdout.write(f"{'self ms':>9}  package")
+        for package, self_ms in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:10]:
+            self.stdout.write(f"{self_ms:>9.1f}  {package}")
+        self.stdout.write("")
+
+        report = {
+            "runs": options["runs"],
+            "cold_start_ms": round(statistics.median(wall_ms), 1),
+            "boot_ms": round(statistics.median(boot_ms), 1),
+            "target_ms": target_ms,
+            "mongo_client_created": client_created,
+            "packages": {package: round(ms, 1) for package, ms in packages.items()},
+            "modules": [{"module": name, "self_ms": round(s, 2), "cumulative_ms": round(c, 2)}
+                        for name, (s, c) in slowest],
+        }
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
+
+        self.stdout.write(
+            f"Cold start (median of {options['runs']}): {report['cold_start_ms']:.0f} ms including the "
+            f"interpreter, {report['boot_ms']:.0f} ms loading the application; target {target_ms:.0f} ms."
+        )
+        problems = []
+        if client_created:
+            problems.append("a MongoClient was created while booting; connections must wait for the first query")
+        if report["cold_start_ms"] > target_ms:
+            problems.append(f"cold start {report['cold_start_ms']:.0f} ms is over the {target_ms:.0f} ms target")
+        for problem in problems:
+            self.stdout.write(self.style.WARNING(problem[0].upper() + problem[1:] + "."))
+        if not problems:
+            self.stdout.write(self.style.SUCCESS("Within the cold-start target."))
+        elif options["fail_over_target"]:
+            raise CommandError(f"{len(problems)} startup problem(s).")
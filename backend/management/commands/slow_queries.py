@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from backend.slow_queries import get_config
+from db_connection import get_db
+
+SORT_FIELDS = {"total": "totalMs", "count": "count", "max": "maxMs"}
+
+
+class Command(BaseCommand):
+    help = "Print the query shapes recorded by the slow-query log, worst first."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sort", choices=sorted(SORT_FIELDS), default="total",
+                            help="Rank by total time (default), number of slow runs or slowest run.")
+        parser.add_argument("--limit", type=int, default=20)
+        parser.add_argument("--collscan", action="store_true", help="Only shapes whose plan is a collection scan.")
+        parser.add_argument("--reset", action="store_true", help="Delete the recorded shapes and exit.")
+
+    def handle(self, *args, **options):
+        collection = get_db()[get_config()["collection"]]
+        if options["reset"]:
+            deleted = collection.delete_many({}).deleted_count
+            self.stdout.write(f"Deleted {deleted} recorded query shapes.")
+            return
+
+        query = {"collscan": True} if options["collscan"] else {}
+        offenders = list(collection.find(query).sort(SORT_FIELDS[options["sort"]], -1).limit(options["limit"]))
+        if not offenders:
+            self.stdout.write("No slow queries recorded.")
+            return
+
+        for rank, entry in enumerate(offenders, 1):
+            mean = entry["totalMs"] / entry["count"]
+            self.stdout.write(
+                f"{rank:>3}. {entry['command']} {entry['collection']}: {entry['count']} slow runs, "
+                f"total {entry['totalMs']:.0f} ms, mean {mean:.1f} ms, max {entry['maxMs']:.1f} ms"
+            )
+            plan = entry.get("plan", "not explained")
+            style = self.style.WARNING if entry.get("collscan") else (lambda text: text)
+            self.stdout.write(style(f"     plan: {plan}"))
+            self.stdout.write(f"     shape: {entry['shape']}")
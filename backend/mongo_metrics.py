@@ -0,0 +1,265 @@
+import contextvars
+import threading
+import time
+
+import bson
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import Http404, HttpResponse
+from pymongo import monitoring
+
+# Per-request Mongo accounting. A CommandListener on the shared clients adds
+# every command to the stats of the request running in the current context,
+# MongoMetricsMiddleware turns those into a Server-Timing header, and the
+# process-wide aggregates are served in Prometheus text format by metrics_view.
+# With MONGO_METRICS['enabled'] off, neither the listener nor the middleware
+# is installed.
+
+DEFAULTS = {
+    "enabled": False,
+    # Re-encodes each command and reply to BSON to size it, in the request thread: about as
+    # costly as the driver's own encoding, so only turn it on while measuring payloads
+    "track_bytes": False,
+    "server_timing": True,
+}
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "MONGO_METRICS", {})}
+
+
+def metrics_enabled():
+    return get_config()["enabled"]
+
+
+class RequestStats:
+    """Mongo work done on behalf of one request."""
+    __slots__ = ("commands", "failures", "duration", "bytes_sent", "bytes_received")
+
+    def __init__(self):
+        self.commands = 0
+        self.failures = 0
+        self.duration = 0.0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+
+# Async tasks and sync_to_async threads inherit the context, so they share the request's stats object
+_current = contextvars.ContextVar("mongo_request_stats", default=None)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Counter:
+    def __init__(self, name, help, label):
+        self.name, self.help, self.label = name, help, label
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_value, amount=1):
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_value, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{{{self.label}="{_escape(label_value)}"}} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, label, buckets):
+        self.name, self.help, self.label, self.buckets = name, help, label, buckets
+        self._values = {}  # label value -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        with self._lock:
+            series = self._values.get(label_value)
+            if series is None:
+                series = self._values[label_value] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_value, series in sorted(self._values.items()):
+                label = f'{self.label}="{_escape(label_value)}"'
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {series[-1]}')
+                lines.append(f"{self.name}_sum{{{label}}} {series[-2]}")
+                lines.append(f"{self.name}_count{{{label}}} {series[-1]}")
+        return lines
+
+
+COMMAND_SECONDS = Histogram("mongo_command_duration_seconds", "Duration of MongoDB commands.", "command",
+                            LATENCY_BUCKETS)
+COMMAND_FAILURES = Counter("mongo_command_failures_total", "MongoDB commands that returned an error.", "command")
+REQUEST_SECONDS = Histogram("django_request_duration_seconds", "Duration of requests, by view.", "view",
+                            LATENCY_BUCKETS)
+REQUEST_MONGO_SECONDS = Histogram("django_request_mongo_seconds", "Time spent in MongoDB per request, by view.",
+                                  "view", LATENCY_BUCKETS)
+REQUEST_MONGO_COMMANDS = Histogram("django_request_mongo_commands", "MongoDB commands issued per request, by view.",
+                                   "view", COUNT_BUCKETS)
+BYTES_SENT = Counter("django_request_mongo_sent_bytes_total", "BSON bytes of commands sent to MongoDB, by view.",
+                     "view")
+BYTES_RECEIVED = Counter("django_request_mongo_received_bytes_total", "BSON bytes of MongoDB replies, by view.",
+                         "view")
+METRICS = [COMMAND_SECONDS, COMMAND_FAILURES, REQUEST_SECONDS, REQUEST_MONGO_SECONDS, REQUEST_MONGO_COMMANDS,
+           BYTES_SENT, BYTES_RECEIVED]
+
+
+def register(*metrics):
+    """Add metrics defined elsewhere (e.g. the learning path write buffer) to /metrics."""
+    METRICS.extend(metrics)
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Feeds command durations (and sizes) into the current request and the process aggregates."""
+
+    def __init__(self, track_bytes):
+        self.track_bytes = track_bytes
+
+    def started(self, event):
+        stats = _current.get()
+        if stats is not None and self.track_bytes:
+            stats.bytes_sent += len(bson.encode(event.command))
+
+    def succeeded(self, event):
+        duration = event.duration_micros / 1e6
+        COMMAND_SECONDS.observe(event.command_name, duration)
+        stats = _current.get()
+        if stats is not None:
+            stats.commands += 1
+            stats.duration += duration
+            if self.track_bytes:
+                stats.bytes_received += len(bson.encode(event.reply))
+
+    def failed(self, event):
+        duration = event.duration_micros / 1e6
+        COMMAND_SECONDS.observe(event.command_name, duration)
+        COMMAND_FAILURES.inc(event.command_name)
+        stats = _current.get()
+        if stats is not None:
+            stats.commands += 1
+            stats.failures += 1
+            stats.duration += duration
+
+
+def command_listeners():
+    """Event listeners for new Mongo clients: the command listener when metrics are enabled, else none."""
+    config = get_config()
+    if not config["enabled"]:
+        return []
+    return [MongoCommandListener(config["track_bytes"])]
+
+
+def view_name(request):
+    """Class name of the view that handled the request (LearningPathView, LoginView, ...)."""
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unresolved"
+    func = match.func
+    view_class = getattr(func, "view_class", None) or getattr(func, "cls", None)
+    return view_class.__name__ if view_class is not None else getattr(func, "__name__", "unknown")
+
+
+class MongoMetricsMiddleware:
+    """
+    Attributes Mongo commands to the request and view that issued them and adds
+    a Server-Timing header. Removed from the stack when metrics are disabled.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        config = get_config()
+        if not config["enabled"]:
+            raise MiddlewareNotUsed
+        self.server_timing = config["server_timing"]
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats, time.perf_counter() - started)
+
+    def finish(self, request, response, stats, elapsed):
+        view = view_name(request)
+        REQUEST_SECONDS.observe(view, elapsed)
+        REQUEST_MONGO_SECONDS.observe(view, stats.duration)
+        REQUEST_MONGO_COMMANDS.observe(view, stats.commands)
+        if stats.bytes_sent:
+            BYTES_SENT.inc(view, stats.bytes_sent)
+            BYTES_RECEIVED.inc(view, stats.bytes_received)
+        if self.server_timing:
+            # Streaming responses add their Mongo time after the headers are sent, so only the first batch counts
+            response["Server-Timing"] = (
+                f'mongo;dur={stats.duration * 1000:.2f};desc="{stats.commands} commands", '
+                f"app;dur={elapsed * 1000:.2f}"
+            )
+        return response
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint; 404 unless MONGO_METRICS['enabled'] is set."""
+    if not metrics_enabled():
+        raise Http404
+    from db_connection import pool_stats
+    from users.authentication import token_cache_stats
+    from users.hashing import hashing_stats
+
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.expose())
+    pool = pool_stats()
+    for key in ("open_connections", "in_use", "max_pool_size"):
+        if key in pool:
+            lines.append(f"# TYPE mongo_pool_{key} gauge")
+            lines.append(f"mongo_pool_{key} {pool[key]}")
+    # Login/signup capacity: the password hashing pool and the verified-token cache
+    hashing, tokens = hashing_stats(), token_cache_stats()
+    for name, kind, value in (
+        ("password_hash_completed_total", "counter", hashing["completed"]),
+        ("password_hash_rejected_total", "counter", hashing["rejected"]),
+        ("password_hash_queue_wait_seconds_total", "counter", hashing["queue_wait_ms"] / 1000),
+        ("password_hash_seconds_total", "counter", hashing["hash_ms"] / 1000),
+        ("jwt_token_cache_size", "gauge", tokens["size"]),
+        ("jwt_token_cache_hits_total", "counter", tokens["hits"]),
+        ("jwt_token_cache_misses_total", "counter", tokens["misses"]),
+    ):
+        lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"{name} {value}")
+    return HttpResponse("\n".join(lines) + "\n", content_type="text/plain; version=0.0.4; charset=utf-8")
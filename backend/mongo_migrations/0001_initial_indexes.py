@@ -0,0 +1,21 @@
+"""Indexes for the lookups hit on every login, signup and class update."""
+from pymongo import ASCENDING, IndexModel
+
+
+def apply(db):
+    # Unique indexes also enforce the duplicate checks done at signup;
+    # creation fails if the collections already contain duplicates.
+    db["teachers"].create_indexes([
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("employeeID", ASCENDING)], name="employeeID_unique", unique=True),
+    ])
+    db["students"].create_indexes([
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("enrollmentNumber", ASCENDING)], name="enrollmentNumber_unique", unique=True),
+    ])
+    db["users"].create_indexes([
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ])
+    db["learning_paths"].create_indexes([
+        IndexModel([("classID", ASCENDING)], name="classID"),
+    ])
@@ -0,0 +1,35 @@
+"""Backfill searchKeys on teachers and students and index them for directory search."""
+from pymongo import ASCENDING, IndexModel, UpdateOne
+
+from users.models import search_keys
+
+BATCH_SIZE = 1000
+
+
+def backfill(collection):
+    requests = []
+    for account in collection.find({"searchKeys": {"$exists": False}}):
+        requests.append(UpdateOne({"_id": account["_id"]}, {"$set": {"searchKeys": search_keys(account)}}))
+        if len(requests) >= BATCH_SIZE:
+            collection.bulk_write(requests, ordered=False)
+            requests = []
+    if requests:
+        collection.bulk_write(requests, ordered=False)
+
+
+def apply(db):
+    backfill(db["teachers"])
+    backfill(db["students"])
+    # Equality filter, then the _id sort, then the searchKeys prefix range: pages come
+    # back in index order and the prefix is checked on index keys, without a sort stage.
+    db["teachers"].create_indexes([
+        IndexModel([("_id", ASCENDING), ("searchKeys", ASCENDING)], name="_id_searchKeys"),
+    ])
+    db["students"].create_indexes([
+        IndexModel([("_id", ASCENDING), ("searchKeys", ASCENDING)], name="_id_searchKeys"),
+        IndexModel([("department", ASCENDING), ("_id", ASCENDING), ("searchKeys", ASCENDING)],
+                   name="department_id_searchKeys"),
+        # Its (classID, _id) prefix also pages the class roster
+        IndexModel([("classID", ASCENDING), ("_id", ASCENDING), ("searchKeys", ASCENDING)],
+                   name="classID_id_searchKeys"),
+    ])
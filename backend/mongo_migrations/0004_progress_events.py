@@ -0,0 +1,8 @@
+"""Index for per-class progress history; per-path history reads _id ranges."""
+from pymongo import ASCENDING, IndexModel
+
+
+def apply(db):
+    db["progress_events"].create_indexes([
+        IndexModel([("classID", ASCENDING), ("day", ASCENDING)], name="classID_day"),
+    ])
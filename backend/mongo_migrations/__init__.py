@@ -0,0 +1,6 @@
+"""
+Versioned MongoDB migrations, applied in file-name order by `manage.py mongo_migrate`.
+
+Each module is named `<version>_<description>.py` and defines `apply(db)`.
+Migrations must be idempotent so re-running a partially applied one is safe.
+"""
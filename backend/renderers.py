@@ -0,0 +1,112 @@
+import datetime
+import json
+from collections.abc import Mapping
+
+import bson
+from bson.decimal128 import Decimal128
+from bson.objectid import ObjectId
+from bson.raw_bson import RawBSONDocument
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library encoder
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # MessagePackRenderer is only offered when msgpack is installed
+    msgpack = None
+
+
+class MongoJSONEncoder(JSONEncoder):
+    """DRF's encoder plus the Mongo types that come straight out of pymongo."""
+
+    def default(self, obj):
+        if isinstance(obj, ObjectId):
+            return str(obj)
+        if isinstance(obj, Decimal128):
+            return str(obj.to_decimal())
+        if isinstance(obj, RawBSONDocument):
+            return bson.decode(obj.raw)
+        return super().default(obj)
+
+
+# orjson handles str/int/float/list/dict/datetime itself and only calls this for the rest
+default = MongoJSONEncoder().default
+
+
+if orjson is not None:
+    def dumps(data):
+        """Encode data (including ObjectId, datetime and Decimal128) to JSON bytes."""
+        return orjson.dumps(data, default=default, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+else:
+    def dumps(data):
+        """Encode data (including ObjectId, datetime and Decimal128) to JSON bytes."""
+        return json.dumps(data, cls=MongoJSONEncoder, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class MongoJSONRenderer(JSONRenderer):
+    """
+    JSON renderer that serializes raw Mongo documents directly, so views can
+    return pymongo results without converting ObjectIds first. Uses orjson
+    when it is installed.
+    """
+    encoder_class = MongoJSONEncoder
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        # Indented output (?indent= / browsable API) stays on the stock renderer
+        if self.get_indent(accepted_media_type or '', renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+class BSONRenderer(BaseRenderer):
+    """
+    Renders BSON for internal consumers. Documents fetched as RawBSONDocument
+    are written out as their original bytes without being decoded. BSON needs
+    a document at the top level, so lists are wrapped as {"results": [...]}.
+    """
+    media_type = 'application/bson'
+    format = 'bson'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if isinstance(data, RawBSONDocument):
+            return data.raw
+        if not isinstance(data, Mapping):
+            data = {"results": data}
+        return bson.encode(data)
+
+
+def _msgpack_default(obj):
+    if isinstance(obj, datetime.datetime):
+        return obj.isoformat()
+    if isinstance(obj, RawBSONDocument):
+        return bson.decode(obj.raw)
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    return MongoJSONEncoder().default(obj)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Renders MessagePack; ObjectIds become strings and datetimes ISO 8601 strings, as in JSON."""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_msgpack_default)
+
+
+# Binary formats offered alongside JSON by views that opt in
+BINARY_RENDERER_CLASSES = [BSONRenderer] + ([MessagePackRenderer] if msgpack is not None else [])
@@ -28,6 +28,7 @@ JWT_AUTH = {
     "ACCESS_TOKEN_LIFETIME": datetime.timedelta(hours=2),  # Access token valid for 2 hours
     "REFRESH_TOKEN_LIFETIME": datetime.timedelta(days=7),  # Refresh token valid for 7 days
     "ALGORITHM": "HS256",  # JWT signing algorithm
+    "VERIFIED_TOKEN_CACHE_SIZE": 1024,  # Decoded tokens kept in memory until they expire
 }
 
 # SECURITY WARNING: don't run with debug turned on in production!
@@ -48,10 +49,13 @@ INSTALLED_APPS = [
     'rest_framework',
     'rest_framework.authtoken',
     'corsheaders',
+    'backend',  # Project-wide management commands: mongo_migrate, bench, slow_queries, profile_startup
     'users',
+    'learning_paths',
 ]
 
 MIDDLEWARE = [
+    'backend.mongo_metrics.MongoMetricsMiddleware',  # Outermost, so the app timing covers every middleware
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -98,21 +102,93 @@ DATABASES = {
 
 
 
-MONGO_DB_NAME = 'learning-path-dashboard'
-MONGO_URI = 'mongodb://localhost:27017'
+# Nothing connects at import time: db_connection opens the client on the first query
+MONGO_DB_NAME = os.environ.get('MONGO_DB_NAME', 'learning-path-dashboard')
+MONGO_URI = os.environ.get('MONGO_URI', 'mongodb://localhost:27017')
 
 MONGO_CONFIG = {
     'uri': MONGO_URI,
     'db_name': MONGO_DB_NAME,
+    # Connection pool shared by every request in a worker process
+    'max_pool_size': 50,
+    'min_pool_size': 0,
+    'max_idle_time_ms': 60000,  # Close connections idle for longer than a minute
+    'max_connecting': 4,
+    'wait_queue_timeout_ms': 5000,  # Fail fast instead of queueing forever when the pool is exhausted
+    'server_selection_timeout_ms': 5000,
+    'async_driver': 'pymongo',  # 'pymongo' (AsyncMongoClient) or 'motor', used by the async views
+}
+
+# Route the learning path and user list/detail/login endpoints to their async
+# variants. ASGI only (backend/asgi.py): under WSGI every async view would run on
+# a new event loop with its own Mongo client and pool, so backend.wsgi refuses it.
+# Learning path POST and PUT still run the sync view, on a worker thread.
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', 'false').lower() in ('1', 'true')
+
+# Per-request Mongo command accounting, Server-Timing headers and the /metrics endpoint.
+# When disabled the command listener and middleware are not installed at all.
+MONGO_METRICS = {
+    'enabled': os.environ.get('MONGO_METRICS', 'false').lower() in ('1', 'true'),
+    # Sizes every command and reply by re-encoding it to BSON, which roughly doubles the
+    # encoding work per query; enable while sizing payloads, not in normal operation
+    'track_bytes': os.environ.get('MONGO_METRICS_TRACK_BYTES', 'false').lower() in ('1', 'true'),
+    'server_timing': True,
+}
+
+# Write-behind buffer merging rapid topic ticks and unconditional PUTs per learning path
+# into one bulk_write every flush_interval_ms (or max_ops changes). Writes answer 202
+# unless ?sync=1 is passed or 'synchronous' is set.
+LEARNING_PATH_WRITE_BUFFER = {
+    'enabled': os.environ.get('LEARNING_PATH_WRITE_BUFFER', 'false').lower() in ('1', 'true'),
+    'flush_interval_ms': 200,
+    'max_ops': 500,
+    'synchronous': False,
+}
+
+# Commands slower than threshold_ms are explained once per query shape and aggregated
+# in the `slow_queries` collection; `manage.py slow_queries` lists the worst shapes.
+SLOW_QUERIES = {
+    'enabled': os.environ.get('SLOW_QUERY_LOG', 'false').lower() in ('1', 'true'),
+    'threshold_ms': int(os.environ.get('SLOW_QUERY_MS', '100')),
+    'explain': True,
+    'collection': 'slow_queries',
+}
+
+
+# Password hashing runs on a bounded pool; requests beyond
+# max_workers + max_queue get a 503 with Retry-After
+PASSWORD_HASHING = {
+    'max_workers': 4,
+    'max_queue': 32,
+    'retry_after': 1,
+}
+
+
+# Student/teacher typeahead: page size cap and the p95 latency bench_search checks against
+DIRECTORY_SEARCH = {
+    'max_page_size': 50,
+    'latency_target_ms': 20,
+}
+
+
+# Time for a fresh worker to import the application and load its URLconf,
+# as measured by `manage.py profile_startup`
+STARTUP = {
+    'cold_start_target_ms': int(os.environ.get('COLD_START_TARGET_MS', '1500')),
 }
 
 
 REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'backend.renderers.MongoJSONRenderer',  # Serializes ObjectId/datetime/Decimal128 directly
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',  # Adjust per your needs
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-  
+        # users.authentication.JWTAuthentication is set per view: installed here, a stale
+        # Bearer header would be rejected even on login
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
     ],
@@ -0,0 +1,246 @@
+import datetime
+import hashlib
+import json
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from pymongo import monitoring
+
+# Slow-operation recorder. A CommandListener on the shared client notices
+# commands slower than SLOW_QUERIES['threshold_ms'] and hands them to a
+# background thread, which explains each new query shape once, flags
+# collection scans, and keeps one aggregated record per shape in the
+# `slow_queries` collection (see `manage.py slow_queries`).
+
+logger = logging.getLogger("mongo.slow_queries")
+
+DEFAULTS = {
+    "enabled": False,
+    "threshold_ms": 100,
+    "explain": True,
+    "collection": "slow_queries",
+    "queue_size": 1000,  # Slow commands waiting to be recorded; extra ones are dropped
+}
+
+# Commands that take a query and can be explained, mapped to the fields that make up their shape
+EXPLAINABLE = {
+    "find": ("filter", "sort", "projection"),
+    "aggregate": ("pipeline",),
+    "count": ("query",),
+    "distinct": ("key", "query"),
+    "findAndModify": ("query", "sort"),
+    "update": ("updates",),
+    "delete": ("deletes",),
+}
+
+# Driver bookkeeping that must not be sent back inside an explain
+_DRIVER_FIELDS = ("lsid", "$db", "$clusterTime", "txnNumber", "$readPreference", "readConcern",
+                  "writeConcern", "startTransaction", "autocommit", "apiVersion")
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "SLOW_QUERIES", {})}
+
+
+# Pipeline options that name collections or fields rather than hold values
+_STRUCTURAL_KEYS = {"coll", "from", "as", "localField", "foreignField", "connectFromField", "connectToField"}
+
+
+def sort_shape(sort):
+    """A sort spec as [field, direction] pairs: its key order matters, unlike a filter's."""
+    return [[field, direction] for field, direction in dict(sort).items()]
+
+
+def normalize(value):
+    """Replace every literal in a query with "?", keeping field names and operators."""
+    if isinstance(value, dict):
+        return {key: item if key in _STRUCTURAL_KEYS else sort_shape(item) if key == "$sort" else normalize(item)
+                for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        # Pipelines keep their stages; value lists such as $in collapse to one placeholder
+        if value and all(isinstance(item, dict) for item in value):
+            return [normalize(item) for item in value]
+        return "?"
+    return "?"
+
+
+def query_shape(command_name, command):
+    """Normalized, hashable description of what a command asks for, independent of its values."""
+    collection = command.get(command_name)
+    fields = EXPLAINABLE[command_name]
+    shape = {"command": command_name, "collection": collection}
+    for field in fields:
+        if field in ("updates", "deletes"):
+            statements = command.get(field) or [{}]
+            shape[field] = normalize({"q": statements[0].get("q", {})})
+        elif field == "sort":
+            # Direction is part of the shape
+            shape[field] = sort_shape(command[field]) if field in command else None
+        elif field == "projection":
+            shape[field] = dict(command[field]) if field in command else None
+        elif field == "key":
+            shape[field] = command.get(field)
+        else:
+            shape[field] = normalize(command.get(field, {}))
+    return shape
+
+
+def shape_id(shape):
+    # Keys are sorted, so filters that differ only in key order share an id
+    return hashlib.sha1(json.dumps(shape, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def explain_command(command_name, command):
+    """The command as it can be passed to explain: driver fields dropped, write batches cut to one statement."""
+    command = {key: value for key, value in command.items() if key not in _DRIVER_FIELDS}
+    if command_name in ("update", "delete"):
+        field = command_name + "s"
+        command[field] = command[field][:1]
+    elif command_name == "find":
+        command.pop("batchSize", None)
+    elif command_name == "aggregate":
+        command["cursor"] = {}
+    return command
+
+
+def plan_stages(plan):
+    """Stage names (with index names) of a winning plan, outermost first."""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stage = plan["stage"]
+            if plan.get("indexName"):
+                stage += f"({plan['indexName']})"
+            stages.append(stage)
+        for key in ("queryPlan", "inputStage", "inputStages", "shards", "winningPlan"):
+            child = plan.get(key)
+            for item in (child if isinstance(child, list) else [child]):
+                stages.extend(plan_stages(item))
+    return stages
+
+
+def summarize_explain(explain):
+    """(plan summary, uses a collection scan) from an explain document."""
+    planner = explain.get("queryPlanner")
+    if planner is None and explain.get("stages"):
+        # Aggregations explain per stage; the $cursor stage holds the query plan
+        planner = next((stage["$cursor"]["queryPlanner"] for stage in explain["stages"] if "$cursor" in stage), {})
+    stages = plan_stages((planner or {}).get("winningPlan", {}))
+    return " > ".join(stages), any(stage == "COLLSCAN" for stage in stages)
+
+
+class SlowQueryRecorder:
+    """Explains and stores slow commands on a daemon thread, off the request path."""
+
+    def __init__(self, config):
+        self.config = config
+        self.threshold_us = config["threshold_ms"] * 1000
+        self._queue = queue.Queue(maxsize=config["queue_size"])
+        self._explained = set()  # Shapes explained by this process
+        self._thread = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def submit(self, item):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="slow-query-recorder", daemon=True)
+                self._thread.start()
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def is_recorder_thread(self):
+        return self._thread is not None and threading.get_ident() == self._thread.ident
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                self.record(*item)
+            except Exception:
+                logger.exception("Could not record slow %s command.", item[1])
+
+    def record(self, database_name, command_name, command, duration_ms, failed):
+        from db_connection import get_client
+
+        shape = query_shape(command_name, command)
+        key = shape_id(shape)
+        db = get_client()[database_name]
+        update = {
+            "$inc": {"count": 1, "totalMs": duration_ms, "failures": int(failed)},
+            "$max": {"maxMs": duration_ms},
+            "$set": {"lastSeen": datetime.datetime.now(datetime.timezone.utc)},
+            "$setOnInsert": {"shape": json.dumps(shape, default=str), "command": command_name,
+                             "collection": shape["collection"], "database": database_name,
+                             "firstSeen": datetime.datetime.now(datetime.timezone.utc)},
+        }
+        plan = None
+        if self.config["explain"] and key not in self._explained:
+            self._explained.add(key)
+            explain = db.command({"explain": explain_command(command_name, command), "verbosity": "queryPlanner"})
+            plan, collscan = summarize_explain(explain)
+            update["$set"].update({"plan": plan, "collscan": collscan})
+        db[self.config["collection"]].update_one({"_id": key}, update, upsert=True)
+
+        if plan is not None:
+            level = logging.WARNING if update["$set"]["collscan"] else logging.INFO
+            logger.log(level, "Slow %s on %s (%.1f ms), plan %s: %s", command_name, shape["collection"],
+                       duration_ms, plan, update["$setOnInsert"]["shape"])
+        else:
+            logger.info("Slow %s on %s (%.1f ms), shape %s", command_name, shape["collection"], duration_ms, key)
+
+
+class SlowQueryListener(monitoring.CommandListener):
+    """Remembers explainable commands until they finish and submits the slow ones."""
+
+    def __init__(self, recorder):
+        self.recorder = recorder
+        self._in_flight = {}
+
+    def _key(self, event):
+        return event.request_id, event.connection_id
+
+    def started(self, event):
+        if event.command_name not in EXPLAINABLE or self.recorder.is_recorder_thread():
+            return
+        if event.command.get(event.command_name) == self.recorder.config["collection"]:
+            return
+        self._in_flight[self._key(event)] = (event.database_name, event.command)
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+    def _finish(self, event, failed):
+        started = self._in_flight.pop(self._key(event), None)
+        if started is None or event.duration_micros < self.recorder.threshold_us:
+            return
+        database_name, command = started
+        self.recorder.submit((database_name, event.command_name, command, event.duration_micros / 1000, failed))
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def get_recorder():
+    """The process-wide recorder shared by the sync and async clients' listeners."""
+    global _recorder
+    if _recorder is None:
+        with _recorder_lock:
+            if _recorder is None:
+                _recorder = SlowQueryRecorder(get_config())
+    return _recorder
+
+
+def command_listeners():
+    """The slow-query listener when SLOW_QUERIES['enabled'] is set, else none."""
+    if not get_config()["enabled"]:
+        return []
+    return [SlowQueryListener(get_recorder())]
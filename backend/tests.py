@@ -0,0 +1,88 @@
+from unittest import mock
+
+import bson
+from bson import ObjectId
+from django.test import SimpleTestCase, override_settings
+
+from .mongo_metrics import MongoCommandListener, RequestStats, _current, get_config
+from .slow_queries import normalize, query_shape, shape_id
+
+
+class NormalizeTests(SimpleTestCase):
+
+    def test_values_are_stripped(self):
+        query = {"classID": "C1", "progress": {"$gte": 0.5}, "_id": {"$in": [ObjectId(), ObjectId()]},
+                 "$or": [{"title": "Algebra"}, {"title": {"$regex": "^geo"}}]}
+        self.assertEqual(normalize(query), {"classID": "?", "progress": {"$gte": "?"}, "_id": {"$in": "?"},
+                                            "$or": [{"title": "?"}, {"title": {"$regex": "?"}}]})
+
+    def test_pipeline_structure_is_kept(self):
+        pipeline = [
+            {"$match": {"classID": "C1"}},
+            {"$lookup": {"from": "learning_paths", "localField": "classID", "foreignField": "classID",
+                         "as": "paths"}},
+            {"$sort": {"progress": -1, "_id": 1}},
+            {"$limit": 10},
+        ]
+        self.assertEqual(normalize(pipeline), [
+            {"$match": {"classID": "?"}},
+            {"$lookup": {"from": "learning_paths", "localField": "classID", "foreignField": "classID",
+                         "as": "paths"}},
+            {"$sort": [["progress", -1], ["_id", 1]]},
+            {"$limit": "?"},
+        ])
+
+
+class QueryShapeTests(SimpleTestCase):
+
+    def find(self, filter, sort=None):
+        command = {"find": "learning_paths", "filter": filter, "projection": {"title": 1}, "lsid": {"id": 1}}
+        if sort is not None:
+            command["sort"] = sort
+        return query_shape("find", command)
+
+    def test_values_do_not_change_the_shape(self):
+        first = self.find({"classID": "C1", "progress": {"$lt": 0.5}})
+        second = self.find({"classID": "C2", "progress": {"$lt": 0.9}})
+        self.assertEqual(first, second)
+        self.assertEqual(first["filter"], {"classID": "?", "progress": {"$lt": "?"}})
+        self.assertNotIn("lsid", first)
+
+    def test_filter_key_order_does_not_change_the_shape(self):
+        self.assertEqual(shape_id(self.find({"classID": "C1", "title": "t"})),
+                         shape_id(self.find({"title": "u", "classID": "C2"})))
+
+    def test_sort_order_and_direction_do(self):
+        ids = {shape_id(self.find({}, sort)) for sort in ({"a": 1, "b": 1}, {"b": 1, "a": 1}, {"a": -1, "b": 1})}
+        self.assertEqual(len(ids), 3)
+
+    def test_write_batches_are_shaped_by_their_first_statement(self):
+        command = {"update": "learning_paths", "updates": [{"q": {"_id": ObjectId()}, "u": {"$set": {"a": 1}}},
+                                                           {"q": {"title": "t"}, "u": {}}]}
+        self.assertEqual(query_shape("update", command)["updates"], {"q": {"_id": "?"}})
+
+
+class CommandListenerTests(SimpleTestCase):
+
+    def run_command(self, listener):
+        stats = RequestStats()
+        token = _current.set(stats)
+        try:
+            listener.started(mock.Mock(command={"find": "learning_paths", "filter": {}}))
+            listener.succeeded(mock.Mock(command_name="find", duration_micros=1500, reply={"ok": 1}))
+        finally:
+            _current.reset(token)
+        return stats
+
+    def test_sizes_are_only_measured_when_tracking_bytes(self):
+        with mock.patch("backend.mongo_metrics.bson.encode", wraps=bson.encode) as encode:
+            stats = self.run_command(MongoCommandListener(track_bytes=False))
+            self.assertEqual((stats.commands, stats.bytes_sent, stats.bytes_received), (1, 0, 0))
+            encode.assert_not_called()
+            stats = self.run_command(MongoCommandListener(track_bytes=True))
+        self.assertEqual(stats.bytes_sent, len(bson.encode({"find": "learning_paths", "filter": {}})))
+        self.assertEqual(stats.bytes_received, len(bson.encode({"ok": 1})))
+
+    def test_tracking_bytes_is_off_by_default(self):
+        with override_settings(MONGO_METRICS={"enabled": True}):
+            self.assertFalse(get_config()["track_bytes"])
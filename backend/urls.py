@@ -1,9 +1,11 @@
 
 from django.contrib import admin
 from django.urls import path, include
+from backend.mongo_metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('users.urls')),  # Include users app routes
     path('api/learning-paths/',include('learning_paths.urls')),
+    path('metrics', metrics_view, name='metrics'),  # Prometheus scrape target, see MONGO_METRICS
 ]
\ No newline at end of file
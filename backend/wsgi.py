@@ -9,8 +9,14 @@ https://docs.djangoproject.com/en/5.0/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_wsgi_application()
+
+if settings.ASYNC_VIEWS:
+    # Each async view would run on its own short-lived event loop with a new Mongo client and pool
+    raise ImproperlyConfigured("ASYNC_VIEWS needs an ASGI server (backend.asgi); unset it under WSGI.")
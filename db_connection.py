@@ -1,8 +1,216 @@
+import asyncio
+import inspect
+import os
+import threading
+import weakref
+
 import pymongo
+from pymongo import monitoring
+from django.conf import settings
+
+from backend import mongo_metrics, slow_queries
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Keeps running counters of connection pool activity for pool_stats()."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.created = 0
+        self.closed = 0
+        self.checked_out = 0
+        self.checked_in = 0
+        self.checkout_failed = 0
+        self.pools_cleared = 0
+
+    def _incr(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._incr("pools_cleared")
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._incr("created")
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._incr("closed")
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._incr("checkout_failed")
+
+    def connection_checked_out(self, event):
+        self._incr("checked_out")
+
+    def connection_checked_in(self, event):
+        self._incr("checked_in")
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "open_connections": self.created - self.closed,
+                "in_use": self.checked_out - self.checked_in,
+                "created": self.created,
+                "closed": self.closed,
+                "checkouts": self.checked_out,
+                "checkout_failures": self.checkout_failed,
+                "pools_cleared": self.pools_cleared,
+            }
+
+
+# One client per process. pymongo clients are not fork-safe, so the registry
+# remembers which pid created the client and rebuilds it in forked workers.
+_lock = threading.Lock()
+_client = None
+_client_pid = None
+_pool_listener = None
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _client_options():
+    config = settings.MONGO_CONFIG
+    return {
+        "maxPoolSize": config.get("max_pool_size", 100),
+        "minPoolSize": config.get("min_pool_size", 0),
+        "maxIdleTimeMS": config.get("max_idle_time_ms"),
+        "maxConnecting": config.get("max_connecting", 2),
+        "waitQueueTimeoutMS": config.get("wait_queue_timeout_ms"),
+        "serverSelectionTimeoutMS": config.get("server_selection_timeout_ms", 30000),
+    }
+
+
+def _command_listeners():
+    # Both are empty lists unless enabled in settings, so commands are not observed by default
+    return mongo_metrics.command_listeners() + slow_queries.command_listeners()
+
+
+def get_client():
+    """Return the process-wide MongoClient, creating it on first use."""
+    global _client, _client_pid, _pool_listener
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+    with _lock:
+        if _client is None or _client_pid != pid:
+            _pool_listener = PoolStatsListener()
+            _client = pymongo.MongoClient(
+                settings.MONGO_CONFIG["uri"],
+                event_listeners=[_pool_listener, *_command_listeners()],
+                **_client_options()
+            )
+            _client_pid = pid
+    return _client
+
+
+def get_db():
+    """Return the configured dashboard database on the shared client."""
+    return get_client()[settings.MONGO_CONFIG["db_name"]]
+
+
+def get_async_client():
+    """
+    Return the async Mongo client for the running event loop.
+
+    Async clients are bound to the loop they were first used on, so one is
+    kept per loop, and each has its own pool: code that runs short-lived loops
+    must close_async_client() before the loop ends. MONGO_CONFIG['async_driver']
+    selects pymongo's native AsyncMongoClient ("pymongo", the default) or motor ("motor").
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        if settings.MONGO_CONFIG.get("async_driver", "pymongo") == "motor":
+            from motor.motor_asyncio import AsyncIOMotorClient as client_class
+        else:
+            from pymongo import AsyncMongoClient as client_class
+        client = client_class(settings.MONGO_CONFIG["uri"], event_listeners=_command_listeners(), **_client_options())
+        _async_clients[loop] = client
+    return client
+
+
+def get_async_db():
+    """Return the dashboard database on the current loop's async client."""
+    return get_async_client()[settings.MONGO_CONFIG["db_name"]]
+
+
+async def close_async_client():
+    """Close the running loop's async client, if it has one."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        closed = client.close()  # A coroutine for AsyncMongoClient, plain call for motor
+        if inspect.isawaitable(closed):
+            await closed
+
+
+def close_client():
+    """Close the shared client; the next get_client() call opens a new one."""
+    global _client, _client_pid
+    with _lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
+
+
+def duplicate_key_field(error):
+    """Return the indexed field a DuplicateKeyError was raised for, if the server reported it."""
+    details = error.details or {}
+    key_pattern = details.get("keyPattern")
+    if key_pattern:
+        return next(iter(key_pattern))
+    # Older servers only name the index in the message, e.g. "index: employeeID_unique"
+    message = details.get("errmsg", str(error))
+    if "index: " in message:
+        return message.split("index: ", 1)[1].split()[0].rsplit("_", 1)[0]
+    return None
+
+
+def pool_stats():
+    """Return pool utilisation counters for the current process."""
+    if _pool_listener is None or _client_pid != os.getpid():
+        return {"open_connections": 0, "in_use": 0}
+    stats = _pool_listener.snapshot()
+    stats["max_pool_size"] = _client_options()["maxPoolSize"]
+    return stats
+
+
+def _reset_after_fork():
+    # Drop the parent's client without closing it; its sockets belong to the parent.
+    global _client, _client_pid, _pool_listener, _lock, _async_clients
+    _lock = threading.Lock()
+    _client = None
+    _client_pid = None
+    _pool_listener = None
+    _async_clients = weakref.WeakKeyDictionary()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class _DatabaseProxy:
+    """Module-level `db` that resolves the shared client on every access."""
 
-url='mongodb://localhost:27017/'
-client=pymongo.MongoClient(url)
+    def __getitem__(self, name):
+        return get_db()[name]
 
+    def __getattr__(self, name):
+        return getattr(get_db(), name)
 
-db=client['learning-path-dashboard']
 
+db = _DatabaseProxy()
@@ -0,0 +1,172 @@
+import json
+from asgiref.sync import sync_to_async
+from bson.errors import InvalidId
+from bson.objectid import ObjectId
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.request import Request
+from backend.renderers import dumps
+from db_connection import get_async_db
+from .mongodb_services import build_projection, RAW_CODEC_OPTIONS, VERSION_FIELD
+from .views import LearningPathView, detail_variant, make_etag, not_modified_etag, version_projection
+
+# Async counterparts of the views in views.py, used when settings.ASYNC_VIEWS
+# is enabled. They await the async Mongo driver instead of blocking a thread,
+# so one ASGI worker can keep many Mongo requests in flight.
+
+sync_learning_path_view = LearningPathView.as_view()
+
+
+def json_response(data, status=status.HTTP_200_OK):
+    return HttpResponse(dumps(data), status=status, content_type="application/json")
+
+
+async def stream_documents(cursor):
+    """Async counterpart of views.stream_documents."""
+    yield b"["
+    first = True
+    async for doc in cursor:
+        yield (b"" if first else b",") + dumps(doc)
+        first = False
+    yield b"]"
+
+
+class AsyncAPIView(View):
+    """Plain Django view with JSON body parsing; CSRF-exempt like DRF's APIView."""
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        view.csrf_exempt = True
+        return view
+
+    def parse_body(self, request):
+        return json.loads(request.body or b"null")
+
+
+class AsyncLearningPathView(AsyncAPIView):
+    collection_name = 'learning_paths'
+    default_page_size = 50
+    max_page_size = 500
+    # The formats LearningPathView offers; the browsable API needs a DRF view, so browsers get JSON
+    renderer_classes = [renderer for renderer in LearningPathView.renderer_classes if renderer.format != "api"]
+
+    def collection(self, raw=False):
+        collection = get_async_db()[self.collection_name]
+        # BSON responses reuse the bytes Mongo sent, as in LearningPathView.wants_raw
+        return collection.with_options(codec_options=RAW_CODEC_OPTIONS) if raw else collection
+
+    def negotiate(self, request):
+        """(renderer, media type) for the request's Accept header or ?format=, like DRF's APIView."""
+        renderers = [renderer_class() for renderer_class in self.renderer_classes]
+        return DefaultContentNegotiation().select_renderer(Request(request), renderers)
+
+    def render(self, negotiated, data, status=status.HTTP_200_OK, headers=None):
+        renderer, media_type = negotiated
+        response = HttpResponse(renderer.render(data, media_type, {}), status=status)
+        response["Content-Type"] = f"{media_type}; charset={renderer.charset}" if renderer.charset else media_type
+        for name, value in (headers or {}).items():
+            response[name] = value
+        return response
+
+    async def post(self, request):
+        """Create learning paths through LearningPathView.post, streamed ingest included."""
+        return await self.run_sync_view(request)
+
+    async def run_sync_view(self, request, **kwargs):
+        """
+        Serve the request with the sync LearningPathView on a worker thread. Writes go through
+        its parsers, streaming readers and write buffer, so they behave the same under ASGI.
+        """
+        def respond():
+            return sync_learning_path_view(request, **kwargs).render()
+        return await sync_to_async(respond, thread_sensitive=False)()
+
+    async def get(self, request, pk=None):
+        """Retrieve a page of learning paths (or all of them) or a single learning path by ID."""
+        try:
+            negotiated = self.negotiate(request)
+        except NotAcceptable as e:
+            return json_response({"detail": str(e.detail)}, status=status.HTTP_406_NOT_ACCEPTABLE)
+        raw = negotiated[0].format == "bson"
+        fields = [f for f in request.GET.get("fields", "").split(",") if f]
+        exclude = [f for f in request.GET.get("exclude", "").split(",") if f]
+        try:
+            projection = build_projection(fields, exclude)
+        except ValueError as e:
+            return json_response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if pk:
+            return await self.get_detail(request, pk, projection, negotiated)
+
+        if request.GET.get("stream") in ("1", "true"):
+            cursor = self.collection().find({}, projection).sort("_id", 1).batch_size(500)
+            return StreamingHttpResponse(stream_documents(cursor), content_type="application/json")
+
+        paginate = "limit" in request.GET or "after" in request.GET
+        query = {}
+        try:
+            limit = int(request.GET.get("limit", self.default_page_size))
+            if request.GET.get("after"):
+                query = {"_id": {"$gt": ObjectId(request.GET["after"])}}
+        except (ValueError, InvalidId):
+            return json_response({"error": "Invalid limit or cursor."}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, self.max_page_size))
+
+        try:
+            cursor = self.collection(raw).find(query, projection).sort("_id", 1)
+            if paginate:
+                cursor = cursor.limit(limit + 1)
+            documents = [doc async for doc in cursor]
+        except Exception as e:
+            return json_response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        if not paginate:
+            return self.render(negotiated, documents)
+
+        next_cursor = None
+        if len(documents) > limit:
+            documents = documents[:limit]
+            next_cursor = str(documents[-1]["_id"])
+        return self.render(negotiated, {"results": documents, "next": next_cursor})
+
+    async def get_detail(self, request, pk, projection, negotiated):
+        """Async counterpart of LearningPathView.get_detail: ETag, If-None-Match and format negotiation."""
+        variant = detail_variant(request.GET, negotiated[0].format)
+        if_none_match = request.headers.get("If-None-Match")
+        projection, hide_version = version_projection(projection)
+        try:
+            if if_none_match:
+                current = await self.collection().find_one({"_id": ObjectId(pk)}, {"_id": 0, VERSION_FIELD: 1})
+                if current is None:
+                    return json_response({"error": "Learning path not found."}, status=status.HTTP_404_NOT_FOUND)
+                etag = not_modified_etag(if_none_match, pk, current.get(VERSION_FIELD, 0), variant)
+                if etag:
+                    response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+                    response["ETag"] = etag
+                    return response
+            document = await self.collection(negotiated[0].format == "bson").find_one({"_id": ObjectId(pk)}, projection)
+        except Exception as e:
+            return json_response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        if not document:
+            return json_response({"error": "Learning path not found."}, status=status.HTTP_404_NOT_FOUND)
+        etag = make_etag(pk, document.get(VERSION_FIELD, 0), variant)
+        if hide_version and isinstance(document, dict):
+            document.pop(VERSION_FIELD, None)
+        return self.render(negotiated, document, headers={"ETag": etag})
+
+    async def put(self, request, pk):
+        """Update a learning path through LearningPathView.put, so If-Match and the write buffer apply."""
+        return await self.run_sync_view(request, pk=pk)
+
+    async def delete(self, request, pk):
+        """Delete a learning path by ID."""
+        try:
+            result = await self.collection().delete_one({"_id": ObjectId(pk)})
+        except Exception as e:
+            return json_response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        if result.deleted_count:
+            return json_response({"message": "Learning path deleted successfully!"})
+        return json_response({"error": "No document found with the given ID."}, status=status.HTTP_404_NOT_FOUND)
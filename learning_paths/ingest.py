@@ -0,0 +1,147 @@
+import codecs
+import json
+
+# Incremental readers for large uploads: documents are yielded as soon as they
+# are complete, so memory is bounded by one read chunk plus one document.
+
+READ_CHUNK_SIZE = 64 * 1024
+MAX_ITEM_SIZE = 4 * 1024 * 1024  # Characters one array item or NDJSON line may span
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+_NUMBER_CHARS = set("0123456789+-.eE")
+_LITERALS = ("true", "false", "null", "NaN", "Infinity", "-Infinity")
+
+
+class IngestParseError(ValueError):
+    """Raised when the upload stops being valid JSON; `index` is the item that failed."""
+
+    def __init__(self, message, index):
+        super().__init__(message)
+        self.index = index
+
+
+def _read_text(stream, chunk_size):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            tail = decoder.decode(b"", final=True)
+            if tail:
+                yield tail
+            return
+        yield decoder.decode(chunk)
+
+
+def _is_truncated(buffer, error):
+    """Whether a decode error only means the buffer ends inside a value, so more input may fix it."""
+    if error.msg.startswith("Unterminated string"):
+        return True  # Only raised when the closing quote is past the end of the buffer
+    rest = buffer[error.pos:]
+    if error.msg.startswith("Invalid \\uXXXX escape"):
+        return len(rest) < 11  # u + 4 hex digits, possibly followed by a \u low surrogate
+    # Nothing left, a literal cut short, or the tail of a number such as "1." or "2e"
+    return (not rest.strip() or any(literal.startswith(rest) for literal in _LITERALS)
+            or all(char in _NUMBER_CHARS for char in rest))
+
+
+def _ends_inside_number(item, buffer, end):
+    """A number that runs to the buffer edge may have more digits in the next chunk."""
+    if isinstance(item, bool) or not isinstance(item, (int, float)):
+        return False
+    return all(char in _NUMBER_CHARS for char in buffer[end:])
+
+
+def iter_json_array(stream, chunk_size=READ_CHUNK_SIZE, max_item_size=MAX_ITEM_SIZE):
+    """
+    Yield the elements of a top-level JSON array read incrementally from `stream`.
+    Reading stops at the first malformed item, and no item may span more than
+    `max_item_size` characters.
+    """
+    chunks = _read_text(stream, chunk_size)
+    buffer, pos, index = "", 0, 0
+    eof = False
+    started = False
+
+    def fill():
+        nonlocal buffer, pos, eof
+        try:
+            buffer = buffer[pos:] + next(chunks)
+        except StopIteration:
+            buffer = buffer[pos:]
+            eof = True
+        pos = 0
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buffer) or eof:
+                return
+            fill()
+
+    skip_whitespace()
+    if pos >= len(buffer) or buffer[pos] != "[":
+        raise IngestParseError("Expected a JSON array.", index)
+    pos += 1
+    while True:
+        skip_whitespace()
+        if pos >= len(buffer):
+            raise IngestParseError("Unterminated JSON array.", index)
+        if buffer[pos] == "]":
+            return
+        if started:
+            if buffer[pos] != ",":
+                raise IngestParseError("Expected ',' between array items.", index)
+            pos += 1
+            skip_whitespace()
+        while True:
+            try:
+                item, end = _decoder.raw_decode(buffer, pos)
+                if eof or not _ends_inside_number(item, buffer, end):
+                    break
+            except json.JSONDecodeError as e:
+                if eof or not _is_truncated(buffer, e):
+                    raise IngestParseError(f"Invalid JSON: {e.msg}.", index)
+            if len(buffer) - pos > max_item_size:
+                raise IngestParseError(f"Item is larger than {max_item_size} characters.", index)
+            fill()
+        pos = end
+        started = True
+        yield item
+        index += 1
+
+
+def iter_ndjson(stream, chunk_size=READ_CHUNK_SIZE, max_item_size=MAX_ITEM_SIZE):
+    """
+    Yield one JSON value per non-blank line of newline-delimited JSON. Lines are
+    independent, so an unparseable line, or one longer than `max_item_size`
+    characters, is yielded as an IngestParseError instead of ending the upload.
+    """
+    pending = ""
+    index = 0
+    oversized = False  # Skipping the rest of a line already reported as too long
+    for text in _read_text(stream, chunk_size):
+        lines = (pending + text).split("\n")
+        pending = lines.pop()
+        for line in lines:
+            if oversized:
+                oversized = False
+            elif line.strip():
+                yield _parse_line(line, index)
+                index += 1
+        if len(pending) > max_item_size:
+            if not oversized:
+                yield IngestParseError(f"Line is longer than {max_item_size} characters.", index)
+                index += 1
+                oversized = True
+            pending = ""
+    if pending.strip() and not oversized:
+        yield _parse_line(pending, index)
+
+
+def _parse_line(line, index):
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError as e:
+        return IngestParseError(f"Invalid JSON: {e.msg}.", index)
@@ -0,0 +1,67 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncRequestFactory, RequestFactory
+
+from backend.benchmarks import summarize
+from db_connection import close_async_client, get_db
+from learning_paths.async_views import AsyncLearningPathView
+from learning_paths.views import LearningPathView
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the sync learning path views on a thread pool (the WSGI model) with the "
+        "async views on one event loop (the ASGI model) against the configured MongoDB."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--concurrency", type=int, default=100,
+                            help="Threads for the sync run, in-flight coroutines for the async run.")
+        parser.add_argument("--path", default="/api/learning-paths/?limit=20&fields=title,progress,classID")
+
+    def handle(self, *args, **options):
+        if not get_db()["learning_paths"].find_one({}, {"_id": 1}):
+            raise CommandError("learning_paths is empty; load some documents before benchmarking.")
+        total, concurrency, path = options["requests"], options["concurrency"], options["path"]
+
+        for result in (self.run_sync(total, concurrency, path), asyncio.run(self.run_async(total, concurrency, path))):
+            self.stdout.write(
+                f"{result['name']:>5}: {result['requests']} requests, {result['throughput_rps']} req/s, "
+                f"p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, p99 {result['p99_ms']} ms"
+            )
+
+    def run_sync(self, total, concurrency, path):
+        view = LearningPathView.as_view()
+        factory = RequestFactory()
+
+        def one(_):
+            started = time.perf_counter()
+            response = view(factory.get(path))
+            response.render()
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(one, range(total)))
+        return summarize("wsgi", latencies, time.perf_counter() - started)
+
+    async def run_async(self, total, concurrency, path):
+        view = AsyncLearningPathView.as_view()
+        factory = AsyncRequestFactory()
+        gate = asyncio.Semaphore(concurrency)
+
+        async def one():
+            async with gate:
+                started = time.perf_counter()
+                await view(factory.get(path))
+                return time.perf_counter() - started
+
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - started
+        await close_async_client()  # The client belongs to this asyncio.run() loop
+        return summarize("asgi", latencies, elapsed)
@@ -0,0 +1,87 @@
+import datetime
+import time
+
+import bson
+from bson.objectid import ObjectId
+from bson.raw_bson import RawBSONDocument
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from backend.renderers import BSONRenderer, MessagePackRenderer, MongoJSONRenderer, msgpack
+
+
+def make_learning_paths(count, units, topics):
+    """Synthetic learning path documents shaped like the ones pymongo returns."""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return [
+        {
+            "_id": ObjectId(),
+            "title": f"Learning path {i}",
+            "classID": f"CLASS-{i % 50}",
+            "progress": 0.5,
+            "version": 3,
+            "updatedAt": now,
+            "learningPath": [
+                {
+                    "unitTitle": f"Unit {u}",
+                    "topics": [{"name": f"Topic {u}.{t}", "completed": t % 2 == 0} for t in range(topics)],
+                }
+                for u in range(units)
+            ],
+        }
+        for i in range(count)
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare render time of the stock DRF JSONRenderer (with _id conversion loops) and MongoJSONRenderer, "
+        "and CPU time from Mongo wire bytes to response body for the JSON, MessagePack and raw BSON paths."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--documents", type=int, default=5000)
+        parser.add_argument("--units", type=int, default=5)
+        parser.add_argument("--topics", type=int, default=8)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        documents = make_learning_paths(options["documents"], options["units"], options["topics"])
+
+        def stock():
+            # What the views did before: stringify ids by hand, then render
+            copies = [dict(doc) for doc in documents]
+            for doc in copies:
+                doc["_id"] = str(doc["_id"])
+                doc["updatedAt"] = doc["updatedAt"].isoformat()
+            return JSONRenderer().render(copies)
+
+        def mongo():
+            return MongoJSONRenderer().render(documents)
+
+        self.stdout.write("Render only:")
+        for label, render in (("JSONRenderer + _id loop", stock), ("MongoJSONRenderer", mongo)):
+            self.report(label, render, options["repeat"], time.perf_counter)
+
+        # BSON as the driver receives it; each path pays for its own decoding
+        wire = [bson.encode(doc) for doc in documents]
+        paths = [
+            ("decode + JSON", lambda: MongoJSONRenderer().render([bson.decode(b) for b in wire])),
+            ("raw BSON passthrough", lambda: BSONRenderer().render([RawBSONDocument(b) for b in wire])),
+        ]
+        if msgpack is not None:
+            paths.insert(1, ("decode + MessagePack", lambda: MessagePackRenderer().render([bson.decode(b) for b in wire])))
+        self.stdout.write("CPU from wire bytes to response body:")
+        for label, render in paths:
+            self.report(label, render, options["repeat"], time.process_time)
+
+    def report(self, label, render, repeat, clock):
+        timings = []
+        for _ in range(repeat):
+            started = clock()
+            body = render()
+            timings.append(clock() - started)
+        self.stdout.write(
+            f"{label:>24}: best {min(timings) * 1000:.1f} ms, "
+            f"mean {sum(timings) / len(timings) * 1000:.1f} ms, {len(body) / 1024:.0f} KiB"
+        )
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from learning_paths.mongodb_services import MongoDBService, build_projection
+
+COLLECTION = "learning_paths"
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the BSON bytes MongoDB returns for learning paths with and without a "
+        "?fields= / ?exclude= projection, to size what a sparse fieldset saves."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fields", default="title,progress,classID",
+                            help="Comma-separated ?fields= to measure (default: title,progress,classID).")
+        parser.add_argument("--exclude", help="Comma-separated ?exclude= to measure instead of --fields.")
+        parser.add_argument("--limit", type=int, default=1000, help="Documents to read (default 1000).")
+
+    def handle(self, *args, **options):
+        if options["exclude"]:
+            selection = {"exclude": [f for f in options["exclude"].split(",") if f]}
+        else:
+            selection = {"fields": [f for f in options["fields"].split(",") if f]}
+        try:
+            projection = build_projection(**selection)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        # Raw documents are the undecoded bytes of the reply, so their sizes are what crossed the wire
+        collection = MongoDBService().get_collection(COLLECTION, raw=True)
+        full = [len(doc.raw) for doc in collection.find({}).sort("_id", 1).limit(options["limit"])]
+        if not full:
+            raise CommandError(f"{COLLECTION} is empty; load some documents first.")
+        sparse = [len(doc.raw) for doc in collection.find({}, projection).sort("_id", 1).limit(options["limit"])]
+
+        full_total, sparse_total = sum(full), sum(sparse)
+        saved = 1 - sparse_total / full_total
+        self.stdout.write(f"Projection: {projection}")
+        self.stdout.write(f"Whole documents: {full_total} bytes over {len(full)} documents "
+                          f"({full_total / len(full):.0f} bytes each)")
+        self.stdout.write(f"Projected:       {sparse_total} bytes over {len(sparse)} documents "
+                          f"({sparse_total / len(sparse):.0f} bytes each)")
+        self.stdout.write(self.style.SUCCESS(f"{saved:.1%} fewer bytes returned by MongoDB."))
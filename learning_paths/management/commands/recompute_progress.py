@@ -0,0 +1,74 @@
+import datetime
+
+from bson import json_util
+from django.core.management.base import BaseCommand, CommandError
+
+from db_connection import get_db
+from learning_paths.mongodb_services import MongoDBService
+
+COLLECTION = "learning_paths"
+CHECKPOINTS_COLLECTION = "job_checkpoints"
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute completedTopics, totalTopics and progress for learning paths inside MongoDB, "
+        "in _id-ordered batches that can be resumed after an interruption."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--class-id", help="Only learning paths of this class.")
+        parser.add_argument("--filter", help='Extra MongoDB filter as extended JSON, e.g. \'{"title": "Algebra"}\'.')
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--resume", action="store_true",
+                            help="Continue after the last batch recorded for the same filter.")
+        parser.add_argument("--dry-run", action="store_true", help="Only count documents whose progress is stale.")
+
+    def handle(self, *args, **options):
+        query = {}
+        if options["filter"]:
+            try:
+                query = json_util.loads(options["filter"])
+            except ValueError as e:
+                raise CommandError(f"Invalid --filter: {e}")
+            if not isinstance(query, dict) or "_id" in query or "$expr" in query:
+                raise CommandError("--filter must be an object without _id or $expr; batches are paged on _id.")
+        if options["class_id"]:
+            query["classID"] = options["class_id"]
+
+        service = MongoDBService()
+        if options["dry_run"]:
+            stale = service.count_stale_progress(COLLECTION, query)
+            self.stdout.write(f"{stale} learning paths have stale progress.")
+            return
+
+        # One checkpoint per filter, so differently filtered runs do not resume each other
+        job_id = "recompute_progress:" + json_util.dumps(query, sort_keys=True)
+        checkpoints = get_db()[CHECKPOINTS_COLLECTION]
+        after = None
+        if options["resume"]:
+            checkpoint = checkpoints.find_one({"_id": job_id})
+            if checkpoint and not checkpoint.get("done"):
+                after = checkpoint["lastId"]
+                self.stdout.write(f"Resuming after {after}.")
+
+        matched_total = modified_total = 0
+        for last_id, matched, modified in service.recompute_progress(COLLECTION, query, options["batch_size"], after):
+            matched_total += matched
+            modified_total += modified
+            checkpoints.update_one(
+                {"_id": job_id},
+                {"$set": {"lastId": last_id, "done": False,
+                          "updatedAt": datetime.datetime.now(datetime.timezone.utc)}},
+                upsert=True,
+            )
+            self.stdout.write(f"Up to {last_id}: {matched_total} scanned, {modified_total} updated.")
+
+        checkpoints.update_one(
+            {"_id": job_id},
+            {"$set": {"done": True, "updatedAt": datetime.datetime.now(datetime.timezone.utc)}},
+            upsert=True,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Recomputed progress: {matched_total} learning paths scanned, {modified_total} updated."
+        ))
@@ -1,43 +1,433 @@
-from pymongo import MongoClient
+import re
+import datetime
 from bson.objectid import ObjectId
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
 from django.conf import settings
+from db_connection import close_client, get_client, pool_stats
+
+# Dotted document paths such as "title" or "learningPath.topics.name";
+# anything with "$" or empty segments could be read as an operator
+FIELD_PATH_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*){0,3}$")
+
+# Learning path fields ?fields= / ?exclude= may name. Units and topics are free-form,
+# so any subpath of learningPath is allowed; the other fields are leaves.
+LEARNING_PATH_FIELDS = frozenset({
+    "_id", "title", "classID", "learningPath", "progress", "completedTopics", "totalTopics", "version", "updatedAt",
+})
+NESTED_FIELDS = frozenset({"learningPath"})
+
+
+def build_projection(fields=None, exclude=None, allowed=LEARNING_PATH_FIELDS, nested=NESTED_FIELDS):
+    """
+    Translate ?fields= / ?exclude= lists into a Mongo projection, or None for whole
+    documents. Raises ValueError for unknown fields and for overlapping paths such
+    as learningPath and learningPath.topics, which Mongo rejects as a path collision.
+    """
+    if fields and exclude:
+        raise ValueError("Use either fields or exclude, not both.")
+    paths = list(dict.fromkeys(fields or exclude or ()))  # Repeats are harmless; keep the first
+    if not paths:
+        return None
+    for path in paths:
+        if not FIELD_PATH_RE.match(path):
+            raise ValueError(f"Invalid field path: {path}")
+        root = path.split(".", 1)[0]
+        if root not in allowed or (root != path and root not in nested):
+            raise ValueError(f"Unknown field: {path}")
+    for path in paths:
+        parent = next((other for other in paths if path.startswith(other + ".")), None)
+        if parent is not None:
+            raise ValueError(f"Overlapping field paths: {parent} and {path}.")
+    if fields:
+        # _id is always returned so clients can address the document
+        return {path: 1 for path in paths}
+    if "_id" in paths:
+        raise ValueError("_id cannot be excluded.")
+    return {path: 0 for path in paths}
+
+
+RAW_CODEC_OPTIONS = CodecOptions(document_class=RawBSONDocument)
+
+# Bumped by every write through MongoDBService; the basis of learning path ETags
+VERSION_FIELD = "version"
+UPDATED_AT_FIELD = "updatedAt"
+
+
+def stamp_new(document):
+    """Give a document about to be inserted its first version."""
+    document[VERSION_FIELD] = 1
+    document[UPDATED_AT_FIELD] = datetime.datetime.now(datetime.timezone.utc)
+    return document
+
+
+def version_update(update_data):
+    """Wrap a $set so the same update bumps the version and updatedAt."""
+    update_data = {k: v for k, v in update_data.items() if k not in (VERSION_FIELD, UPDATED_AT_FIELD)}
+    return {"$set": update_data, "$inc": {VERSION_FIELD: 1}, "$currentDate": {UPDATED_AT_FIELD: True}}
+
+
+class VersionConflict(Exception):
+    """The document exists but has moved past the version the writer expected."""
+
+    def __init__(self, current_version):
+        super().__init__(f"Document is at version {current_version}.")
+        self.current_version = current_version
+
+
+def version_filter(document_id, expected_version=None):
+    """Filter matching a document by _id and, if given, the version the writer last read."""
+    query = {"_id": ObjectId(document_id)}
+    if expected_version is not None:
+        # Documents written before versioning count as version 0
+        query[VERSION_FIELD] = expected_version or {"$in": [0, None]}
+    return query
+
+
+def topic_counts(learning_path):
+    """
+    Aggregation expression folding a learningPath array into {"total": n, "completed": n}
+    with one $reduce over units and a nested $reduce over each unit's topics.
+    """
+    return {"$reduce": {
+        "input": {"$ifNull": [learning_path, []]},
+        "initialValue": {"total": 0, "completed": 0},
+        "in": {"$reduce": {
+            "input": {"$ifNull": ["$$this.topics", []]},
+            # Evaluated in the outer scope, so this carries the running totals across units
+            "initialValue": "$$value",
+            "in": {
+                "total": {"$add": ["$$value.total", 1]},
+                "completed": {"$add": ["$$value.completed", {"$cond": [{"$eq": ["$$this.completed", True]}, 1, 0]}]},
+            },
+        }},
+    }}
+
+
+def progress_expression(completed, total):
+    """progress as LearningPathView.put stores it: the completed fraction rounded to one decimal."""
+    return {"$cond": [{"$gt": [total, 0]}, {"$round": [{"$divide": [completed, total]}, 1]}, 0.0]}
+
+
+def progress_is_stale():
+    """$expr that is true when a document's stored counters or progress disagree with its topics."""
+    return {"$let": {
+        "vars": {"counts": topic_counts("$learningPath")},
+        "in": {"$or": [
+            {"$ne": ["$totalTopics", "$$counts.total"]},
+            {"$ne": ["$completedTopics", "$$counts.completed"]},
+            {"$ne": ["$progress", progress_expression("$$counts.completed", "$$counts.total")]},
+        ]},
+    }}
+
+
+# Update pipeline recomputing the counters and progress of each matched document inside Mongo
+RECOMPUTE_PROGRESS_PIPELINE = [
+    {"$set": {"_topicCounts": topic_counts("$learningPath")}},
+    {"$set": {
+        "totalTopics": "$_topicCounts.total",
+        "completedTopics": "$_topicCounts.completed",
+        "progress": progress_expression("$_topicCounts.completed", "$_topicCounts.total"),
+        VERSION_FIELD: {"$add": [{"$ifNull": ["$" + VERSION_FIELD, 0]}, 1]},
+        UPDATED_AT_FIELD: "$$NOW",
+    }},
+    {"$unset": "_topicCounts"},
+]
+
+
+# Pending value of a topic that flips its current state when applied
+TOGGLE = "toggle"
+
+
+def coalesced_update_pipeline(topics, learning_path=None):
+    """
+    Update pipeline for a batch of changes to one learning path: optionally replace
+    learningPath, then apply {(unit, topic): True | False | TOGGLE}, then recompute
+    the counters and progress and bump the version once for the whole batch.
+    Positions that do not exist are ignored.
+    """
+    pipeline = []
+    if learning_path is not None:
+        pipeline.append({"$set": {"learningPath": {"$literal": learning_path}}})
+    if topics:
+        completed = "$$topic.completed"
+        for (unit_index, topic_index), value in topics.items():
+            target = {"$not": ["$$topic.completed"]} if value == TOGGLE else bool(value)
+            completed = {"$cond": [
+                {"$and": [{"$eq": ["$$ui", unit_index]}, {"$eq": ["$$ti", topic_index]}]}, target, completed,
+            ]}
+        new_topics = {"$map": {
+            "input": {"$range": [0, {"$size": {"$ifNull": ["$$unit.topics", []]}}]},
+            "as": "ti",
+            "in": {"$let": {
+                "vars": {"topic": {"$arrayElemAt": ["$$unit.topics", "$$ti"]}},
+                "in": {"$mergeObjects": ["$$topic", {"completed": completed}]},
+            }},
+        }}
+        touched_units = sorted({unit_index for unit_index, _ in topics})
+        pipeline.append({"$set": {"learningPath": {"$map": {
+            "input": {"$range": [0, {"$size": {"$ifNull": ["$learningPath", []]}}]},
+            "as": "ui",
+            "in": {"$let": {
+                "vars": {"unit": {"$arrayElemAt": ["$learningPath", "$$ui"]}},
+                "in": {"$cond": [
+                    {"$in": ["$$ui", touched_units]},
+                    {"$mergeObjects": ["$$unit", {"topics": new_topics}]},
+                    "$$unit",
+                ]},
+            }},
+        }}}})
+    return pipeline + RECOMPUTE_PROGRESS_PIPELINE
 
 
 class MongoDBService:
     def __init__(self):
-        self.client = MongoClient(settings.MONGO_CONFIG['uri'])
+        # Shared per-process client; constructing the service is cheap
+        self.client = get_client()
         self.db = self.client[settings.MONGO_CONFIG['db_name']]
 
-    def get_collection(self, collection_name):
-        return self.db[collection_name]
+    def get_collection(self, collection_name, raw=False):
+        collection = self.db[collection_name]
+        if raw:
+            # Documents stay as undecoded BSON bytes; fields are only parsed when accessed
+            collection = collection.with_options(codec_options=RAW_CODEC_OPTIONS)
+        return collection
 
     def insert_many(self, collection_name, data):
         collection = self.get_collection(collection_name)
-        result = collection.insert_many(data)
+        result = collection.insert_many([stamp_new(doc) for doc in data])
         return result.inserted_ids
 
+    def insert_batch(self, collection_name, documents):
+        """
+        Unordered insert_many that keeps going past bad documents.
+        Returns (inserted ids by position, {position: error message}).
+        """
+        collection = self.get_collection(collection_name)
+        errors = {}
+        try:
+            collection.insert_many([stamp_new(doc) for doc in documents], ordered=False)
+        except BulkWriteError as e:
+            errors = {error["index"]: error.get("errmsg", "Insert failed.") for error in e.details.get("writeErrors", [])}
+        # insert_many assigns _id on the documents before sending them
+        inserted = {i: doc["_id"] for i, doc in enumerate(documents) if i not in errors}
+        return inserted, errors
+
     def insert_one(self, collection_name, data):
         collection = self.get_collection(collection_name)
-        result = collection.insert_one(data)
+        result = collection.insert_one(stamp_new(data))
         return result.inserted_id
 
-    def find_all(self, collection_name):
-        collection = self.get_collection(collection_name)
-        return list(collection.find({}))
+    def find_all(self, collection_name, projection=None, raw=False):
+        collection = self.get_collection(collection_name, raw)
+        return list(collection.find({}, projection))
+
+    def find_page(self, collection_name, limit, after=None, projection=None, raw=False):
+        """Return up to `limit` documents ordered by _id after the given cursor, plus the next cursor."""
+        collection = self.get_collection(collection_name, raw)
+        query = {"_id": {"$gt": ObjectId(after)}} if after else {}
+        # Fetch one extra document to know whether another page exists
+        documents = list(collection.find(query, projection).sort("_id", 1).limit(limit + 1))
+        next_cursor = None
+        if len(documents) > limit:
+            documents = documents[:limit]
+            next_cursor = str(documents[-1]["_id"])
+        return documents, next_cursor
 
-    def find_by_id(self, collection_name, document_id):
+    def iter_all(self, collection_name, batch_size=500, projection=None):
+        """Yield every document in _id order without materialising the result set."""
         collection = self.get_collection(collection_name)
-        return collection.find_one({"_id": ObjectId(document_id)})
+        return collection.find({}, projection).sort("_id", 1).batch_size(batch_size)
+
+    def find_by_id(self, collection_name, document_id, projection=None, raw=False):
+        collection = self.get_collection(collection_name, raw)
+        return collection.find_one({"_id": ObjectId(document_id)}, projection)
 
     def update_one(self, collection_name, document_id, update_data):
         collection = self.get_collection(collection_name)
-        result = collection.update_one({"_id": ObjectId(document_id)}, {"$set": update_data})
+        result = collection.update_one({"_id": ObjectId(document_id)}, version_update(update_data))
         return result.modified_count
 
+    def update_versioned(self, collection_name, document_id, update_data, expected_version=None, projection=None):
+        """
+        $set update_data in a single find_one_and_update, provided the document is
+        still at expected_version (any version when None), and return the updated
+        document. Returns None if the document does not exist and raises
+        VersionConflict if another write got there first.
+        """
+        collection = self.get_collection(collection_name)
+        document = collection.find_one_and_update(
+            version_filter(document_id, expected_version),
+            version_update(update_data),
+            projection=projection,
+            return_document=ReturnDocument.AFTER,
+        )
+        if document is None and expected_version is not None:
+            # Only a failed precondition pays for the second read that tells 404 from 412
+            current_version = self.get_version(collection_name, document_id)
+            if current_version is not None:
+                raise VersionConflict(current_version)
+        return document
+
+    def get_version(self, collection_name, document_id):
+        """Fetch only a document's version; None if the document does not exist."""
+        collection = self.get_collection(collection_name)
+        document = collection.find_one({"_id": ObjectId(document_id)}, {"_id": 0, VERSION_FIELD: 1})
+        if document is None:
+            return None
+        return document.get(VERSION_FIELD, 0)
+
+    def set_topic_completed(self, collection_name, document_id, unit_index, topic_index, completed=None):
+        """
+        Set (or toggle, when completed is None) one topic's completed flag and
+        keep completedTopics/totalTopics/progress in step, in a single update.
+        Returns the new counters and the path's classID, or None if the path, unit
+        or topic does not exist.
+        """
+        collection = self.get_collection(collection_name)
+        topic_path = f"learningPath.{unit_index}.topics.{topic_index}"
+        was_completed = {"$ifNull": [{"$let": {
+            "vars": {"unit": {"$arrayElemAt": ["$learningPath", unit_index]}},
+            "in": {"$let": {
+                "vars": {"topic": {"$arrayElemAt": ["$$unit.topics", topic_index]}},
+                "in": "$$topic.completed",
+            }},
+        }}, False]}
+        now_completed = {"$not": ["$_completedWas"]} if completed is None else bool(completed)
+
+        # Rebuild only the addressed unit/topic; every other element is passed through untouched
+        new_topics = {"$map": {
+            "input": {"$range": [0, {"$size": "$$unit.topics"}]},
+            "as": "ti",
+            "in": {"$let": {
+                "vars": {"topic": {"$arrayElemAt": ["$$unit.topics", "$$ti"]}},
+                "in": {"$cond": [
+                    {"$eq": ["$$ti", topic_index]},
+                    {"$mergeObjects": ["$$topic", {"completed": "$_completedNow"}]},
+                    "$$topic",
+                ]},
+            }},
+        }}
+        new_learning_path = {"$map": {
+            "input": {"$range": [0, {"$size": "$learningPath"}]},
+            "as": "ui",
+            "in": {"$let": {
+                "vars": {"unit": {"$arrayElemAt": ["$learningPath", "$$ui"]}},
+                "in": {"$cond": [
+                    {"$eq": ["$$ui", unit_index]},
+                    {"$mergeObjects": ["$$unit", {"topics": new_topics}]},
+                    "$$unit",
+                ]},
+            }},
+        }}
+        delta = {"$cond": [
+            {"$eq": ["$_completedWas", "$_completedNow"]}, 0,
+            {"$cond": ["$_completedNow", 1, -1]},
+        ]}
+        pipeline = [
+            {"$set": {"_completedWas": was_completed}},
+            {"$set": {"_completedNow": now_completed}},
+            {"$set": {"learningPath": new_learning_path}},
+            # Documents written before the counters existed fall back to a one-off count
+            {"$set": {"_topicCounts": {"$cond": [
+                {"$and": [{"$isNumber": "$completedTopics"}, {"$isNumber": "$totalTopics"}]},
+                "$$REMOVE",
+                topic_counts("$learningPath"),
+            ]}}},
+            {"$set": {
+                "completedTopics": {"$ifNull": [{"$add": ["$completedTopics", delta]}, "$_topicCounts.completed"]},
+                "totalTopics": {"$ifNull": ["$totalTopics", "$_topicCounts.total"]},
+            }},
+            {"$set": {
+                "progress": progress_expression("$completedTopics", "$totalTopics"),
+                VERSION_FIELD: {"$add": [{"$ifNull": ["$" + VERSION_FIELD, 0]}, 1]},
+                UPDATED_AT_FIELD: "$$NOW",
+            }},
+            {"$unset": ["_completedWas", "_completedNow", "_topicCounts"]},
+        ]
+        return collection.find_one_and_update(
+            {"_id": ObjectId(document_id), topic_path: {"$exists": True}},
+            pipeline,
+            projection={"_id": 0, "classID": 1, "completedTopics": 1, "totalTopics": 1, "progress": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def recompute_progress(self, collection_name, query=None, batch_size=1000, after=None):
+        """
+        Recompute completedTopics/totalTopics/progress for documents matching query,
+        in _id order, with the work done by an update pipeline on the server. Only
+        _ids are read into Python. Documents that are already correct are not
+        written, so their version is kept. Yields (last _id, matched, modified) after
+        each batch; pass the last _id back as `after` to resume.
+        """
+        collection = self.get_collection(collection_name)
+        query = dict(query or {})
+        while True:
+            page_query = {**query, "_id": {"$gt": after}} if after is not None else query
+            ids = [doc["_id"] for doc in collection.find(page_query, {"_id": 1}).sort("_id", 1).limit(batch_size)]
+            if not ids:
+                return
+            result = collection.update_many(
+                {**query, "_id": {"$gte": ids[0], "$lte": ids[-1]}, "$expr": progress_is_stale()},
+                RECOMPUTE_PROGRESS_PIPELINE,
+            )
+            after = ids[-1]
+            yield after, len(ids), result.modified_count
+
+    def count_stale_progress(self, collection_name, query=None):
+        """Number of documents matching query whose stored progress would change on recompute."""
+        collection = self.get_collection(collection_name)
+        return collection.count_documents({**(query or {}), "$expr": progress_is_stale()})
+
+    def class_summary(self, collection_name, class_id):
+        """
+        Per-path and class-wide topic counts and progress for one class, computed
+        by a single aggregation so no learningPath array leaves the server.
+        """
+        collection = self.get_collection(collection_name)
+        pipeline = [
+            {"$match": {"classID": class_id}},
+            {"$project": {"title": 1, "counts": topic_counts("$learningPath")}},
+            {"$project": {
+                "title": 1,
+                "completedTopics": "$counts.completed",
+                "totalTopics": "$counts.total",
+                "progress": progress_expression("$counts.completed", "$counts.total"),
+            }},
+            {"$sort": {"_id": 1}},
+            {"$group": {
+                "_id": None,
+                "pathCount": {"$sum": 1},
+                "completedTopics": {"$sum": "$completedTopics"},
+                "totalTopics": {"$sum": "$totalTopics"},
+                "averageProgress": {"$avg": "$progress"},
+                "paths": {"$push": "$$ROOT"},
+            }},
+            {"$project": {
+                "_id": 0,
+                "pathCount": 1,
+                "completedTopics": 1,
+                "totalTopics": 1,
+                "averageProgress": {"$round": ["$averageProgress", 2]},
+                "paths": 1,
+            }},
+        ]
+        summary = next(collection.aggregate(pipeline), None)
+        if summary is None:
+            summary = {"pathCount": 0, "completedTopics": 0, "totalTopics": 0, "averageProgress": 0.0, "paths": []}
+        return {"classID": class_id, **summary}
+
     def delete_one(self, collection_name, document_id):
         collection = self.get_collection(collection_name)
         result = collection.delete_one({"_id": ObjectId(document_id)})
         return result.deleted_count
 
+    def pool_stats(self):
+        """Return connection pool utilisation for this worker process."""
+        return pool_stats()
+
     def close_connection(self):
-        self.client.close()
+        # The client is shared: close it for the whole process and let the next query reopen it
+        close_client()
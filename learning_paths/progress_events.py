@@ -0,0 +1,130 @@
+import datetime
+import logging
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from db_connection import get_db
+
+# Append-only history of learning path progress, bucketed by path and UTC day.
+# Each bucket holds the day's open/close/min/max progress, a change count and
+# the latest MAX_EVENTS_PER_BUCKET raw events, so a month of history for a
+# path is at most 31 small documents read through the _id index.
+
+logger = logging.getLogger(__name__)
+
+EVENTS_COLLECTION = "progress_events"
+MAX_EVENTS_PER_BUCKET = 500
+DAY_FORMAT = "%Y-%m-%d"
+DUPLICATE_KEY = 11000
+
+
+def day_start(moment):
+    return datetime.datetime(moment.year, moment.month, moment.day, tzinfo=datetime.timezone.utc)
+
+
+def bucket_id(path_id, day):
+    # Path first, then an ISO day, so one path's buckets form a contiguous _id range
+    return f"{path_id}:{day.strftime(DAY_FORMAT)}"
+
+
+def bucket_update(document, now):
+    """
+    Upsert appending one event for an updated learning path to today's bucket. It only
+    matches while the bucket's last counters differ, so an update that changed nothing
+    fails with a duplicate _id instead of writing (see record_progress).
+    """
+    progress = document.get("progress", 0.0)
+    day = day_start(now)
+    counters = {
+        "progress": progress,
+        "completedTopics": document.get("completedTopics", 0),
+        "totalTopics": document.get("totalTopics", 0),
+    }
+    return UpdateOne(
+        {"_id": bucket_id(document["_id"], day), "last": {"$ne": counters}},
+        {
+            "$setOnInsert": {"pathId": document["_id"], "classID": document.get("classID"), "day": day,
+                             "open": progress},
+            "$set": {"close": progress, "lastAt": now, "last": counters},
+            "$min": {"min": progress},
+            "$max": {"max": progress},
+            "$inc": {"changes": 1},
+            "$push": {"events": {"$each": [{"t": now, **counters}], "$slice": -MAX_EVENTS_PER_BUCKET}},
+        },
+        upsert=True,
+    )
+
+
+def record_progress(documents):
+    """
+    Append an event for each updated learning path (dicts with _id, classID and the
+    counters). Failures are logged, never raised: analytics must not fail a write.
+    """
+    now = datetime.datetime.now(datetime.timezone.utc)
+    requests = [bucket_update(document, now) for document in documents]
+    if not requests:
+        return
+    try:
+        get_db()[EVENTS_COLLECTION].bulk_write(requests, ordered=False)
+    except BulkWriteError as e:
+        # Duplicate _ids are buckets whose last event already has these counters: nothing to record
+        errors = [error for error in e.details.get("writeErrors", []) if error.get("code") != DUPLICATE_KEY]
+        if errors or e.details.get("writeConcernErrors"):
+            logger.error("Could not record %d of %d progress events: %s", len(errors) or len(requests),
+                         len(requests), errors[0]["errmsg"] if errors else e)
+    except PyMongoError:
+        logger.exception("Could not record %d progress events.", len(requests))
+
+
+def parse_range(start, end, default_days=30):
+    """(first day, last day) from optional YYYY-MM-DD strings; defaults to the last `default_days` days."""
+    if end:
+        last = day_start(datetime.datetime.strptime(end, DAY_FORMAT))
+    else:
+        last = day_start(datetime.datetime.now(datetime.timezone.utc))
+    if start:
+        first = day_start(datetime.datetime.strptime(start, DAY_FORMAT))
+    else:
+        first = last - datetime.timedelta(days=default_days - 1)
+    if first > last:
+        raise ValueError("from must not be after to.")
+    return first, last
+
+
+def path_history(path_id, first, last, include_events=False):
+    """Daily progress points of one learning path between two days, inclusive."""
+    projection = {"_id": 0, "day": 1, "open": 1, "close": 1, "min": 1, "max": 1, "changes": 1}
+    if include_events:
+        projection["events"] = 1
+    query = {"_id": {"$gte": bucket_id(path_id, first), "$lte": bucket_id(path_id, last)}}
+    return list(get_db()[EVENTS_COLLECTION].find(query, projection).sort("_id", 1))
+
+
+def class_history(class_id, first, last):
+    """
+    Per day, the paths of a class that changed, their average closing progress and
+    the number of changes. Reads only the class's buckets in the range.
+    """
+    pipeline = [
+        {"$match": {"classID": class_id, "day": {"$gte": first, "$lte": last}}},
+        {"$group": {
+            "_id": "$day",
+            "paths": {"$sum": 1},
+            "averageProgress": {"$avg": "$close"},
+            "minProgress": {"$min": "$min"},
+            "maxProgress": {"$max": "$max"},
+            "changes": {"$sum": "$changes"},
+        }},
+        {"$sort": {"_id": 1}},
+        {"$project": {
+            "_id": 0,
+            "day": "$_id",
+            "paths": 1,
+            "averageProgress": {"$round": ["$averageProgress", 2]},
+            "minProgress": 1,
+            "maxProgress": 1,
+            "changes": 1,
+        }},
+    ]
+    return list(get_db()[EVENTS_COLLECTION].aggregate(pipeline))
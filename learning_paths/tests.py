@@ -1,3 +1,552 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import io
+import json
+from unittest import mock
 
-# Create your tests here.
+import bson
+from asgiref.sync import async_to_sync
+from bson.objectid import ObjectId
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from pymongo.errors import BulkWriteError, PyMongoError
+from rest_framework.test import APIClient
+
+import db_connection
+from .async_views import AsyncLearningPathView
+from .ingest import IngestParseError, iter_json_array, iter_ndjson
+from .mongodb_services import VERSION_FIELD, MongoDBService, build_projection, topic_counts
+from .progress_events import bucket_id, bucket_update, day_start, parse_range, record_progress
+from .views import LearningPathView, etag_matches, if_match_version, make_etag
+from .write_buffer import WriteBuffer
+
+
+class CountingStream(io.BytesIO):
+    """BytesIO that counts read() calls, to check how far a reader got."""
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.reads = 0
+
+    def read(self, size=-1):
+        self.reads += 1
+        return super().read(size)
+
+
+class IterJsonArrayTests(SimpleTestCase):
+
+    def parse(self, text, chunk_size, **kwargs):
+        return list(iter_json_array(io.BytesIO(text.encode()), chunk_size=chunk_size, **kwargs))
+
+    def test_items_at_every_chunk_size(self):
+        items = [{"a": 1, "b": [True, None, "xé"]}, 1.5, -2e10, "s", [], True, 123456789, "😀"]
+        text = json.dumps(items)
+        for chunk_size in range(1, len(text) + 2):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(self.parse(text, chunk_size), items)
+
+    def test_numbers_split_across_chunks(self):
+        text = "[1.5, 10, -3e2, 0.25]"
+        for chunk_size in range(1, len(text) + 1):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(self.parse(text, chunk_size), [1.5, 10, -300.0, 0.25])
+
+    def test_bad_item_fails_without_reading_the_rest(self):
+        items = ['{"ok": 1}', '{"bad": 1.}'] + ['{"filler": "%s"}' % ("x" * 100)] * 1000
+        stream = CountingStream(("[" + ",".join(items) + "]").encode())
+        with self.assertRaises(IngestParseError) as raised:
+            list(iter_json_array(stream, chunk_size=64))
+        self.assertEqual(raised.exception.index, 1)
+        self.assertLess(stream.reads, 10)
+
+    def test_truncated_upload(self):
+        with self.assertRaises(IngestParseError):
+            self.parse('[{"a": 1}, {"b": ', 4)
+        with self.assertRaises(IngestParseError):
+            self.parse('[1, 2', 4)
+
+    def test_oversized_item(self):
+        text = json.dumps([{"a": "x" * 1000}])
+        with self.assertRaises(IngestParseError) as raised:
+            self.parse(text, 16, max_item_size=100)
+        self.assertIn("larger than 100", str(raised.exception))
+
+    def test_not_an_array(self):
+        with self.assertRaises(IngestParseError):
+            self.parse('{"a": 1}', 4)
+
+
+class IterNdjsonTests(SimpleTestCase):
+
+    def parse(self, text, chunk_size, **kwargs):
+        return list(iter_ndjson(io.BytesIO(text.encode()), chunk_size=chunk_size, **kwargs))
+
+    def test_bad_line_does_not_stop_the_upload(self):
+        for chunk_size in (1, 3, 7, 64):
+            with self.subTest(chunk_size=chunk_size):
+                items = self.parse('{"a": 1}\n{"a": 1.}\n\n1.25\n{"b": 2}', chunk_size)
+                self.assertEqual(items[0], {"a": 1})
+                self.assertIsInstance(items[1], IngestParseError)
+                self.assertEqual(items[1].index, 1)
+                self.assertEqual(items[2:], [1.25, {"b": 2}])
+
+    def test_oversized_line_is_skipped(self):
+        items = self.parse('{"a": 1}\n"' + "x" * 500 + '"\n{"b": 2}\n', 16, max_item_size=100)
+        self.assertEqual(items[0], {"a": 1})
+        self.assertIsInstance(items[1], IngestParseError)
+        self.assertEqual(items[2:], [{"b": 2}])
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"])
+class StreamingIngestViewTests(SimpleTestCase):
+
+    def test_ndjson_with_charset(self):
+        ids = iter(range(100))
+        with mock.patch.object(MongoDBService, "insert_batch",
+                               side_effect=lambda name, docs: ([next(ids) for _ in docs], {})):
+            response = APIClient().post("/api/learning-paths/", b'{"a": 1}\n{"a": 2}\n',
+                                        content_type="application/x-ndjson; charset=utf-8")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["inserted_ids"], ["0", "1"])
+
+    def test_failed_last_batch_reports_partial_ingest(self):
+        calls = []
+
+        def insert_batch(name, docs):
+            calls.append(len(docs))
+            if len(calls) > 1:
+                raise PyMongoError("boom")
+            return list(range(len(docs))), {}
+
+        with mock.patch.object(MongoDBService, "insert_batch", side_effect=insert_batch):
+            response = APIClient().post("/api/learning-paths/?stream=1&batch_size=2",
+                                        json.dumps([{"a": 1}, {"a": 2}, {"a": 3}]), content_type="application/json")
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.json()["inserted_ids"], ["0", "1"])
+
+    def test_empty_body_is_a_bad_request(self):
+        for url, content_type in (("/api/learning-paths/?stream=1", "application/json"),
+                                  ("/api/learning-paths/", "application/x-ndjson")):
+            with self.subTest(content_type=content_type):
+                response = APIClient().post(url, b"", content_type=content_type)
+                self.assertEqual(response.status_code, 400)
+
+    def test_chunked_ndjson_body(self):
+        # A de-chunked upload from the WSGI server: no Content-Length, input read to EOF
+        body = b"".join(b'{"n": %d}\n' % n for n in range(5))
+        ids = iter(range(100))
+        with mock.patch.object(MongoDBService, "insert_batch",
+                               side_effect=lambda name, docs: ([next(ids) for _ in docs], {})):
+            response = APIClient().generic("POST", "/api/learning-paths/?batch_size=2", b"",
+                                           content_type="application/x-ndjson", CONTENT_LENGTH="",
+                                           **{"wsgi.input": io.BytesIO(body), "wsgi.input_terminated": True})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()["inserted_ids"]), 5)
+
+
+class BuildProjectionTests(SimpleTestCase):
+
+    def test_fields_and_exclude(self):
+        self.assertIsNone(build_projection())
+        self.assertEqual(build_projection(fields=["title", "progress", "title"]), {"title": 1, "progress": 1})
+        self.assertEqual(build_projection(exclude=["learningPath.topics"]), {"learningPath.topics": 0})
+
+    def test_rejected_selections(self):
+        for fields, exclude in (
+            (["title"], ["progress"]),  # Both at once
+            (["title.$where"], None),
+            (["password"], None),  # Not a learning path field
+            (["title.length"], None),  # Only learningPath has subfields
+            (None, ["learningPath", "learningPath.topics"]),  # Mongo path collision
+            (["learningPath.topics", "learningPath.topics.name"], None),
+            (None, ["_id"]),
+        ):
+            with self.subTest(fields=fields, exclude=exclude), self.assertRaises(ValueError):
+                build_projection(fields, exclude)
+
+    def test_sibling_paths_do_not_collide(self):
+        self.assertEqual(build_projection(fields=["learningPath.unitTitle", "learningPath.topics"]),
+                         {"learningPath.unitTitle": 1, "learningPath.topics": 1})
+
+    @override_settings(ALLOWED_HOSTS=["testserver"])
+    def test_collision_is_a_bad_request(self):
+        response = APIClient().get("/api/learning-paths/?exclude=learningPath,learningPath.topics")
+        self.assertEqual(response.status_code, 400)
+
+
+class SetTopicCompletedTests(SimpleTestCase):
+    pk = "65f0c0ffee0000000000abcd"
+
+    def update(self, completed):
+        collection = mock.Mock(**{"find_one_and_update.return_value": {"progress": 0.5}})
+        with mock.patch.object(MongoDBService, "get_collection", return_value=collection):
+            result = MongoDBService().set_topic_completed("learning_paths", self.pk, 1, 2, completed)
+        self.assertEqual(result, {"progress": 0.5})
+        call = collection.find_one_and_update.call_args
+        return call.args[0], call.args[1], call.kwargs
+
+    def stage(self, pipeline, field):
+        return next(stage["$set"][field] for stage in pipeline if field in stage.get("$set", {}))
+
+    def test_only_an_existing_topic_matches(self):
+        query, _, kwargs = self.update(True)
+        self.assertEqual(query, {"_id": ObjectId(self.pk), "learningPath.1.topics.2": {"$exists": True}})
+        self.assertNotIn("learningPath", kwargs["projection"])
+
+    def test_set_or_toggle(self):
+        _, pipeline, _ = self.update(False)
+        self.assertIs(self.stage(pipeline, "_completedNow"), False)
+        _, pipeline, _ = self.update(None)
+        self.assertEqual(self.stage(pipeline, "_completedNow"), {"$not": ["$_completedWas"]})
+
+    def test_counters_are_adjusted_and_only_counted_when_missing(self):
+        _, pipeline, _ = self.update(True)
+        self.assertEqual(self.stage(pipeline, "completedTopics")["$ifNull"][1], "$_topicCounts.completed")
+        _, present, missing = self.stage(pipeline, "_topicCounts")["$cond"]
+        self.assertEqual(present, "$$REMOVE")
+        self.assertEqual(missing, topic_counts("$learningPath"))
+        self.assertIn(VERSION_FIELD, next(stage["$set"] for stage in pipeline if "progress" in stage.get("$set", {})))
+        added = {field for stage in pipeline for field in stage.get("$set", {}) if field.startswith("_")}
+        self.assertEqual(added, set(pipeline[-1]["$unset"]))
+
+
+class CloseConnectionTests(SimpleTestCase):
+
+    def test_next_query_gets_a_new_client(self):
+        service = MongoDBService()  # MongoClient connects lazily, so no server is needed
+        self.addCleanup(db_connection.close_client)
+        service.close_connection()
+        self.assertIsNot(db_connection.get_client(), service.client)
+
+    def test_async_client_is_closed_with_its_loop(self):
+        async def use_and_close():
+            loop = asyncio.get_running_loop()
+            client = db_connection.get_async_client()
+            self.assertIs(db_connection.get_async_client(), client)
+            await db_connection.close_async_client()
+            return loop in db_connection._async_clients
+
+        self.assertFalse(asyncio.run(use_and_close()))
+
+
+class ETagTests(SimpleTestCase):
+    pk = "65f0c0ffee0000000000abcd"
+
+    def test_make_etag(self):
+        self.assertEqual(make_etag(self.pk, 3), f'"{self.pk}-3"')
+        variant = make_etag(self.pk, 3, "title|")
+        self.assertTrue(variant.startswith(f'"{self.pk}-3-'))
+        self.assertNotEqual(variant, make_etag(self.pk, 3, "|title"))
+
+    def test_if_none_match_uses_weak_comparison(self):
+        etag = make_etag(self.pk, 3)
+        self.assertTrue(etag_matches(etag, etag))
+        self.assertTrue(etag_matches(f'"other", W/{etag}', etag))
+        self.assertTrue(etag_matches("*", etag))
+        self.assertFalse(etag_matches(make_etag(self.pk, 2), etag))
+
+    def test_if_match_version(self):
+        self.assertEqual(if_match_version(make_etag(self.pk, 7), self.pk), 7)
+        self.assertEqual(if_match_version(make_etag(self.pk, 7, "title|"), self.pk), 7)
+        self.assertEqual(if_match_version('"x", ' + make_etag(self.pk, 2), self.pk), 2)
+        self.assertEqual(if_match_version("*", self.pk), "*")
+        self.assertIsNone(if_match_version("W/" + make_etag(self.pk, 7), self.pk))  # Strong comparison
+        self.assertIsNone(if_match_version(make_etag("65f0c0ffee0000000000dcba", 7), self.pk))
+        self.assertIsNone(if_match_version("garbage", self.pk))
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"])
+class ConditionalPutTests(SimpleTestCase):
+    pk = "65f0c0ffee0000000000abcd"
+    body = {"title": "t", "version": 4, "learningPath": [{"topics": [{"completed": True}]}]}
+
+    def put(self, **headers):
+        return APIClient().put(f"/api/learning-paths/{self.pk}/", self.body, format="json", **headers)
+
+    @mock.patch("learning_paths.views.record_progress")
+    @mock.patch.object(MongoDBService, "update_versioned")
+    def test_version_in_body_is_not_a_precondition(self, update_versioned, record_progress):
+        update_versioned.return_value = {"_id": self.pk, "version": 5}
+        for _ in range(2):
+            self.assertEqual(self.put().status_code, 200)
+        for call in update_versioned.call_args_list:
+            self.assertIsNone(call.args[3])
+            self.assertNotIn("version", call.args[2])
+
+    @mock.patch("learning_paths.views.record_progress")
+    @mock.patch.object(MongoDBService, "update_versioned")
+    def test_if_match_is_the_precondition(self, update_versioned, record_progress):
+        update_versioned.return_value = {"_id": self.pk, "version": 5}
+        response = self.put(HTTP_IF_MATCH=make_etag(self.pk, 4))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(update_versioned.call_args.args[3], 4)
+        self.assertEqual(response["ETag"], make_etag(self.pk, 5))
+        self.assertEqual(self.put(HTTP_IF_MATCH='"someone-else"').status_code, 412)
+
+
+class FakeAsyncCollection:
+    """find_one over one stored document, like the async driver's collection."""
+
+    def __init__(self, document):
+        self.document = document
+
+    def with_options(self, codec_options=None):
+        return self
+
+    async def find_one(self, query, projection=None):
+        if query["_id"] != self.document["_id"]:
+            return None
+        if projection and 1 in projection.values():
+            return {key: value for key, value in self.document.items() if key in projection or key == "_id"}
+        return dict(self.document)
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"])
+class DetailETagTests(SimpleTestCase):
+    """The sync and async detail views answer with the same ETags, 304s and formats."""
+
+    def setUp(self):
+        self.document = {"_id": ObjectId(), "title": "Algebra", "version": 3}
+        self.pk = str(self.document["_id"])
+
+    def get_sync(self, **headers):
+        with mock.patch.object(MongoDBService, "get_version", return_value=self.document["version"]), \
+                mock.patch.object(MongoDBService, "find_by_id", side_effect=lambda *a, **k: dict(self.document)):
+            return APIClient().get(f"/api/learning-paths/{self.pk}/", **headers)
+
+    def get_async(self, **headers):
+        request = RequestFactory().get(f"/api/learning-paths/{self.pk}/", **headers)
+        with mock.patch("learning_paths.async_views.get_async_db",
+                        return_value={"learning_paths": FakeAsyncCollection(self.document)}):
+            return async_to_sync(AsyncLearningPathView.as_view())(request, pk=self.pk)
+
+    def test_etag_and_not_modified(self):
+        for get in (self.get_sync, self.get_async):
+            with self.subTest(view=get.__name__):
+                response = get()
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response["ETag"], make_etag(self.pk, 3))
+                self.assertEqual(get(HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+                self.assertEqual(get(HTTP_IF_NONE_MATCH=make_etag(self.pk, 2)).status_code, 200)
+
+    def test_bson_is_negotiated(self):
+        etags = set()
+        for get in (self.get_sync, self.get_async):
+            with self.subTest(view=get.__name__):
+                response = get(HTTP_ACCEPT="application/bson")
+                self.assertEqual(response["Content-Type"], "application/bson")
+                self.assertEqual(bson.decode(response.content)["title"], "Algebra")
+                etags.add(response["ETag"])
+        self.assertEqual(len(etags), 1)
+        self.assertNotEqual(etags.pop(), make_etag(self.pk, 3))  # Formats are separate representations
+
+    def test_version_is_hidden_unless_requested(self):
+        for get in (self.get_sync, self.get_async):
+            with self.subTest(view=get.__name__):
+                response = get(QUERY_STRING="fields=title")
+                self.assertNotIn("version", json.loads(response.content))
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"])
+class AsyncWriteParityTests(SimpleTestCase):
+    """With ASYNC_VIEWS on, POST and PUT answer exactly as the sync view does."""
+    pk = "65f0c0ffee0000000000abcd"
+
+    def send(self, view, method, path, body, content_type, **extra):
+        request = getattr(RequestFactory(), method)(path, body, content_type=content_type, **extra)
+        kwargs = {"pk": self.pk} if method == "put" else {}
+        if view == "sync":
+            return LearningPathView.as_view()(request, **kwargs).render()
+        return async_to_sync(AsyncLearningPathView.as_view())(request, **kwargs)
+
+    def assertSameResponse(self, method, path, body, content_type, **extra):
+        responses = {}
+        for view in ("sync", "async"):
+            ids = iter(range(100))
+            with mock.patch.object(MongoDBService, "insert_batch",
+                                   side_effect=lambda name, docs: ([next(ids) for _ in docs], {})), \
+                    mock.patch.object(MongoDBService, "insert_one", return_value=7), \
+                    mock.patch.object(MongoDBService, "update_versioned",
+                                      return_value={"_id": self.pk, "version": 5}), \
+                    mock.patch("learning_paths.views.record_progress"):
+                response = self.send(view, method, path, body, content_type, **extra)
+            responses[view] = (response.status_code, response.content, response.get("ETag"))
+        self.assertEqual(responses["sync"], responses["async"])
+        return responses["sync"]
+
+    def test_post(self):
+        cases = [
+            ("/api/learning-paths/", json.dumps({"title": "t"}), "application/json", 201),
+            ("/api/learning-paths/?stream=1&batch_size=2", json.dumps([{"a": 1}, {"a": 2}, {"a": 3}]),
+             "application/json", 201),
+            ("/api/learning-paths/", b'{"a": 1}\n{"a": 2}\n', "application/x-ndjson", 201),
+            ("/api/learning-paths/", "title=t", "application/x-www-form-urlencoded", 201),
+            ("/api/learning-paths/", b"{", "application/json", 400),
+        ]
+        for path, body, content_type, expected in cases:
+            with self.subTest(path=path, content_type=content_type):
+                self.assertEqual(self.assertSameResponse("post", path, body, content_type)[0], expected)
+
+    def test_put(self):
+        body = json.dumps({"learningPath": [{"topics": [{"completed": True}, {"completed": False}]}]})
+        path = f"/api/learning-paths/{self.pk}/"
+        status_code, _, etag = self.assertSameResponse("put", path, body, "application/json",
+                                                       HTTP_IF_MATCH=make_etag(self.pk, 4))
+        self.assertEqual((status_code, etag), (200, make_etag(self.pk, 5)))
+        self.assertEqual(self.assertSameResponse("put", path, body, "application/json",
+                                                 HTTP_IF_MATCH='"someone-else"')[0], 412)
+
+
+class ProgressEventTests(SimpleTestCase):
+    path_id = ObjectId("65f0c0ffee0000000000abcd")
+    document = {"_id": path_id, "classID": "C1", "progress": 0.5, "completedTopics": 1, "totalTopics": 2}
+
+    def test_parse_range(self):
+        utc = datetime.timezone.utc
+        self.assertEqual(parse_range("2026-03-01", "2026-03-05"),
+                         (datetime.datetime(2026, 3, 1, tzinfo=utc), datetime.datetime(2026, 3, 5, tzinfo=utc)))
+        first, last = parse_range(None, "2026-03-30")
+        self.assertEqual(first, datetime.datetime(2026, 3, 1, tzinfo=utc))  # 30 days, both ends included
+        first, last = parse_range(None, None, default_days=7)
+        self.assertEqual(last, day_start(datetime.datetime.now(utc)))
+        self.assertEqual(last - first, datetime.timedelta(days=6))
+        for start, end in (("2026-03-05", "2026-03-01"), ("03/01/2026", None), ("2026-02-30", None)):
+            with self.subTest(start=start, end=end), self.assertRaises(ValueError):
+                parse_range(start, end)
+
+    def test_events_are_bucketed_by_utc_day(self):
+        utc = datetime.timezone.utc
+        late = bucket_update(self.document, datetime.datetime(2026, 3, 1, 23, 59, 59, tzinfo=utc))
+        early = bucket_update(self.document, datetime.datetime(2026, 3, 1, 0, 0, tzinfo=utc))
+        next_day = bucket_update(self.document, datetime.datetime(2026, 3, 2, 0, 0, tzinfo=utc))
+        self.assertEqual(late._filter["_id"], f"{self.path_id}:2026-03-01")
+        self.assertEqual(early._filter["_id"], late._filter["_id"])
+        self.assertEqual(next_day._filter["_id"], f"{self.path_id}:2026-03-02")
+        self.assertEqual(next_day._doc["$setOnInsert"]["day"], datetime.datetime(2026, 3, 2, tzinfo=utc))
+        # One path's days sort in date order inside its _id range
+        self.assertLess(bucket_id(self.path_id, datetime.datetime(2026, 2, 28)),
+                        bucket_id(self.path_id, datetime.datetime(2026, 3, 1)))
+
+    def test_unchanged_counters_are_not_recorded(self):
+        update = bucket_update(self.document, datetime.datetime.now(datetime.timezone.utc))
+        counters = {"progress": 0.5, "completedTopics": 1, "totalTopics": 2}
+        self.assertEqual(update._filter["last"], {"$ne": counters})
+        self.assertEqual(update._doc["$set"]["last"], counters)
+
+        duplicate = BulkWriteError({"writeErrors": [{"index": 0, "code": 11000, "errmsg": "E11000 duplicate key"}]})
+        events = mock.Mock(**{"bulk_write.side_effect": duplicate})
+        with mock.patch("learning_paths.progress_events.get_db", return_value={"progress_events": events}), \
+                self.assertNoLogs("learning_paths.progress_events"):
+            record_progress([self.document])
+        events.bulk_write.side_effect = BulkWriteError({"writeErrors": [{"index": 0, "code": 2, "errmsg": "bad"}]})
+        with mock.patch("learning_paths.progress_events.get_db", return_value={"progress_events": events}), \
+                self.assertLogs("learning_paths.progress_events", "ERROR"):
+            record_progress([self.document])
+
+
+class FakeCollection:
+    """The few collection methods WriteBuffer uses, over existing _ids whose paths have one unit of two topics."""
+
+    def __init__(self, existing, fail=None):
+        self.existing = set(existing)
+        self.fail = fail  # Exception raised by bulk_write
+        self.writes = []
+
+    def bulk_write(self, requests, ordered=True):
+        if self.fail is not None:
+            raise self.fail
+        self.writes.append(requests)
+
+    def find(self, query, projection=None):
+        return [{"_id": document_id, "progress": 0.0} for document_id in query["_id"]["$in"]
+                if document_id in self.existing]
+
+    def find_one(self, query, projection=None):
+        if query["_id"] not in self.existing:
+            return None
+        for key in query:
+            if key.startswith("learningPath."):
+                _, unit, _, topic = key.split(".")
+                if (int(unit), int(topic)) not in ((0, 0), (0, 1)):
+                    return None
+        return {"_id": query["_id"]}
+
+
+class WriteBufferTests(SimpleTestCase):
+
+    def setUp(self):
+        self.ids = [ObjectId(), ObjectId()]
+        self.collection = FakeCollection(self.ids)
+        patches = [
+            mock.patch("learning_paths.write_buffer.get_db", return_value={"learning_paths": self.collection}),
+            mock.patch("learning_paths.write_buffer.record_progress"),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        # A long interval keeps the background thread from flushing during the test
+        self.buffer = WriteBuffer("learning_paths", flush_interval_ms=60000, max_ops=1000)
+        self.addCleanup(self.buffer.close)
+
+    def test_changes_to_one_path_are_coalesced(self):
+        first, second = self.ids
+        self.assertIsNone(self.buffer.set_topic(first, 0, 0))
+        self.assertIsNone(self.buffer.set_topic(first, 0, 0))  # Cancels the first toggle
+        self.assertIsNone(self.buffer.set_topic(first, 0, 1, completed=True))
+        self.assertIsNone(self.buffer.replace(second, [{"topics": []}]))
+        self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(len(self.collection.writes), 1)
+        self.assertEqual(len(self.collection.writes[0]), 2)
+        stats = self.buffer.stats()
+        self.assertEqual((stats["submitted"], stats["written"], stats["failed"]), (4, 2, 0))
+        self.assertEqual(stats["coalescing_ratio"], 2.0)
+
+    def test_waiting_caller_gets_the_result(self):
+        self.assertTrue(self.buffer.set_topic(self.ids[0], 0, 0, wait=True))
+        self.assertFalse(self.buffer.replace(ObjectId(), [], wait=True))
+        stats = self.buffer.stats()
+        self.assertEqual((stats["written"], stats["missing"]), (1, 1))
+
+    def test_queueing_for_a_missing_path_is_refused(self):
+        self.assertFalse(self.buffer.set_topic(ObjectId(), 0, 0))
+        self.assertEqual(self.buffer.stats()["pending_ops"], 0)
+
+    def test_tick_on_a_missing_topic_is_refused(self):
+        for wait in (False, True):
+            with self.subTest(wait=wait):
+                self.assertFalse(self.buffer.set_topic(self.ids[0], 0, 2, wait=wait))
+                self.assertFalse(self.buffer.set_topic(self.ids[0], 1, 0, wait=wait))
+                self.assertFalse(self.buffer.set_topic(ObjectId(), 0, 0, wait=wait))
+        self.assertEqual(self.buffer.stats()["submitted"], 0)
+        # A pending replacement decides which topics exist
+        self.buffer.replace(self.ids[0], [{"topics": [{}, {}, {}]}])
+        self.assertIsNone(self.buffer.set_topic(self.ids[0], 0, 2))
+        self.assertFalse(self.buffer.set_topic(self.ids[0], 1, 0))
+
+    @override_settings(ALLOWED_HOSTS=["testserver"])
+    def test_buffered_patch_answers_like_the_unbuffered_one(self):
+        path = f"/api/learning-paths/{self.ids[0]}/units/0/topics/%d/"
+        with mock.patch("learning_paths.views.buffering_enabled", return_value=True), \
+                mock.patch("learning_paths.views.get_write_buffer", return_value=self.buffer):
+            self.assertEqual(APIClient().patch(path % 1, {}, format="json").status_code, 202)
+            response = APIClient().patch(path % 5, {}, format="json")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {"error": "No topic found at the given position."})
+
+    def test_failed_write_is_raised_and_not_counted(self):
+        self.collection.fail = PyMongoError("down")
+        self.buffer.set_topic(self.ids[0], 0, 0)
+        with self.assertRaises(PyMongoError), self.assertLogs("learning_paths.write_buffer", "ERROR"):
+            self.buffer.set_topic(self.ids[0], 0, 1, wait=True)
+        stats = self.buffer.stats()
+        self.assertEqual((stats["written"], stats["failed"]), (0, 2))
+        self.assertIsNone(stats["coalescing_ratio"])
+
+    def test_partial_bulk_write_failure(self):
+        first, second = self.ids
+        self.collection.fail = BulkWriteError({"writeErrors": [{"index": 1, "code": 2, "errmsg": "bad"}]})
+        self.buffer.replace(first, [])
+        self.buffer.replace(second, [])
+        with self.assertLogs("learning_paths.write_buffer", "ERROR"):
+            self.assertEqual(self.buffer.flush(), 1)
+        stats = self.buffer.stats()
+        self.assertEqual((stats["written"], stats["failed"]), (1, 1))
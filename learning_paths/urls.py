@@ -1,7 +1,18 @@
+from django.conf import settings
 from django.urls import path
-from .views import LearningPathView
+from .views import (
+    LearningPathView, LearningPathSummaryView, TopicCompletionView, LearningPathHistoryView, ClassProgressHistoryView,
+)
+
+if settings.ASYNC_VIEWS:
+    from .async_views import AsyncLearningPathView as LearningPathView
 
 urlpatterns = [
     path('', LearningPathView.as_view(), name='learning-paths'),
+    # Must precede <str:pk>/, which would otherwise capture "summary" and "history"
+    path('summary/', LearningPathSummaryView.as_view(), name='learning-path-summary'),
+    path('history/', ClassProgressHistoryView.as_view(), name='class-progress-history'),
     path('<str:pk>/', LearningPathView.as_view(), name='learning-path-detail'),
+    path('<str:pk>/history/', LearningPathHistoryView.as_view(), name='learning-path-history'),
+    path('<str:pk>/units/<int:unit>/topics/<int:topic>/', TopicCompletionView.as_view(), name='learning-path-topic'),
 ]
@@ -1,13 +1,119 @@
+import hashlib
 from django.shortcuts import render
-from .mongodb_services import MongoDBService
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from bson.errors import InvalidId
+from bson.objectid import ObjectId
+from .mongodb_services import MongoDBService, VersionConflict, build_projection, VERSION_FIELD
+from .ingest import IngestParseError, iter_json_array, iter_ndjson
+from .write_buffer import buffering_enabled, get_write_buffer
+from .progress_events import record_progress, parse_range, path_history, class_history
 from rest_framework.views import APIView
+from rest_framework.settings import api_settings
+from backend.renderers import dumps, BINARY_RENDERER_CLASSES
 from rest_framework.response import Response
 from rest_framework import status
 # from rest_framework.permissions import IsAuthenticated
 # from rest_framework.authentication import TokenAuthentication
 
+def stream_documents(cursor):
+    """Yield a JSON array chunk by chunk as the Mongo cursor produces documents."""
+    yield b"["
+    first = True
+    for doc in cursor:
+        yield (b"" if first else b",") + dumps(doc)
+        first = False
+    yield b"]"
+
+
+def is_ndjson(request):
+    """Compare the media type only, so `application/x-ndjson; charset=utf-8` is accepted too."""
+    return request.content_type.split(";", 1)[0].strip().lower() == "application/x-ndjson"
+
+
+def body_stream(request):
+    """
+    The request body as a readable stream, or None when there is no body. DRF
+    reports no stream for a missing Content-Length, which is also how chunked
+    uploads arrive: WSGI servers that de-chunk set wsgi.input_terminated, and
+    ASGI requests hold the whole body.
+    """
+    if request.stream is not None:
+        return request.stream
+    django_request = request._request
+    if django_request.META.get("CONTENT_LENGTH"):
+        return None  # An explicit Content-Length: 0
+    environ = getattr(django_request, "environ", {})
+    if environ.get("wsgi.input_terminated"):
+        return environ["wsgi.input"]
+    if isinstance(django_request, ASGIRequest):
+        return django_request
+    return None
+
+
+def make_etag(pk, version, variant="|"):
+    """Strong ETag for one representation (field selection) of one version of a learning path."""
+    if variant == "|":
+        return f'"{pk}-{version}"'
+    return f'"{pk}-{version}-{hashlib.md5(variant.encode()).hexdigest()[:8]}"'
+
+
+def etag_matches(header, etag):
+    """If-None-Match uses the weak comparison, so W/ prefixes are ignored."""
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def detail_variant(query_params, renderer_format):
+    """ETag variant of a detail response: the field selection, plus the format unless it is JSON."""
+    variant = query_params.get("fields", "") + "|" + query_params.get("exclude", "")
+    if renderer_format != "json":
+        variant += "|" + renderer_format
+    return variant
+
+
+def not_modified_etag(if_none_match, pk, version, variant):
+    """The ETag to answer 304 with when If-None-Match names the current representation, else None."""
+    etag = make_etag(pk, version, variant)
+    return etag if etag_matches(if_none_match, etag) else None
+
+
+def version_projection(projection):
+    """
+    The projection with the version added, since every detail response carries an
+    ETag, and whether to drop the version again because the client did not ask for it.
+    """
+    if projection is None:
+        return None, False
+    if 1 in projection.values():
+        return {**projection, VERSION_FIELD: 1}, VERSION_FIELD not in projection
+    return {k: v for k, v in projection.items() if k != VERSION_FIELD} or None, VERSION_FIELD in projection
+
+
+def if_match_version(header, pk):
+    """
+    Version named by an If-Match header: an int, "*" for any version, or None when
+    no tag is one of this path's ETags. If-Match compares strongly, so W/ tags never match.
+    """
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return "*"
+        if len(tag) > 1 and tag[0] == tag[-1] == '"':
+            parts = tag[1:-1].split("-")
+            if len(parts) in (2, 3) and parts[0] == pk and parts[1].isdigit():
+                return int(parts[1])
+    return None
+
+
 class LearningPathView(APIView):
 
+    # application/bson and application/msgpack for internal consumers
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + BINARY_RENDERER_CLASSES
+    default_page_size = 50
+    max_page_size = 500
+    ingest_batch_size = 500
+    max_ingest_batch_size = 5000
 
     # authentication_classes = [TokenAuthentication]
     # permission_classes = [IsAuthenticated]
@@ -19,6 +125,8 @@ class LearningPathView(APIView):
 
     def post(self, request):
         """Create a new learning path or multiple learning paths."""
+        if is_ndjson(request) or request.query_params.get("stream") in ("1", "true"):
+            return self.post_stream(request)
         data = request.data
         if isinstance(data, list):  # Insert multiple documents
             try:
@@ -37,61 +145,213 @@ class LearningPathView(APIView):
         else:
             return Response({"error": "Invalid data format."}, status=status.HTTP_400_BAD_REQUEST)
 
+    def post_stream(self, request):
+        """
+        Ingest a JSON array or NDJSON body incrementally, inserting unordered
+        batches of ?batch_size= documents. request.data is never touched, so
+        the body is not buffered; memory is bounded by the batch size.
+        """
+        try:
+            batch_size = min(int(request.query_params.get("batch_size", self.ingest_batch_size)), self.max_ingest_batch_size)
+        except ValueError:
+            return Response({"error": "batch_size must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        batch_size = max(batch_size, 1)
+        reader = iter_ndjson if is_ndjson(request) else iter_json_array
+        stream = body_stream(request)
+        if stream is None:
+            return Response({"error": "Request body is empty."}, status=status.HTTP_400_BAD_REQUEST)
+
+        inserted_ids, failures = [], []
+        batch = []  # (item index, document)
+
+        def flush():
+            inserted, errors = self.mongo_service.insert_batch(self.collection_name, [doc for _, doc in batch])
+            for position, (index, _) in enumerate(batch):
+                if position in errors:
+                    failures.append({"index": index, "error": errors[position]})
+                else:
+                    inserted_ids.append(str(inserted[position]))
+            batch.clear()
+
+        try:
+            try:
+                for index, item in enumerate(reader(stream)):
+                    if isinstance(item, IngestParseError):
+                        failures.append({"index": index, "error": str(item)})
+                    elif not isinstance(item, dict):
+                        failures.append({"index": index, "error": "Item is not a JSON object."})
+                    else:
+                        batch.append((index, item))
+                        if len(batch) >= batch_size:
+                            flush()
+            except IngestParseError as e:
+                # The rest of a malformed array cannot be recovered; keep what was already parsed
+                failures.append({"index": e.index, "error": str(e)})
+            if batch:
+                flush()
+        except Exception as e:
+            return Response({"error": str(e), "inserted_ids": inserted_ids, "failures": failures},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        failures.sort(key=lambda failure: failure["index"])
+
+        return Response(
+            {"message": "Data saved successfully!" if not failures else "Data saved with errors.",
+             "inserted_ids": inserted_ids, "failures": failures},
+            status=status.HTTP_201_CREATED if not failures else status.HTTP_207_MULTI_STATUS
+        )
+
+    def get_projection(self, request):
+        """Build a Mongo projection from ?fields=a,b or ?exclude=a,b."""
+        fields = [f for f in request.query_params.get("fields", "").split(",") if f]
+        exclude = [f for f in request.query_params.get("exclude", "").split(",") if f]
+        return build_projection(fields, exclude)
+
+    def wants_raw(self, request):
+        """BSON responses can reuse the bytes Mongo sent, so skip decoding them."""
+        return request.accepted_renderer.format == "bson"
+
     def get(self, request, pk=None):
         """Retrieve all learning paths or a single learning path by ID."""
+        try:
+            projection = self.get_projection(request)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
         if pk:
             try:
-                document = self.mongo_service.find_by_id(self.collection_name, pk)
-                if document:
-                    document["_id"] = str(document["_id"])
-
-                    return Response(document, status=status.HTTP_200_OK)
-                else:
-                    return Response({"error": "Learning path not found."}, status=status.HTTP_404_NOT_FOUND)
+                return self.get_detail(request, pk, projection)
             except Exception as e:
                 return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        elif request.query_params.get("stream") in ("1", "true"):
+            # Documents are written to the response as the cursor yields them
+            cursor = self.mongo_service.iter_all(self.collection_name, projection=projection)
+            return StreamingHttpResponse(stream_documents(cursor), content_type="application/json")
+        elif "limit" in request.query_params or "after" in request.query_params:
+            return self.get_page(request, projection)
         else:
             try:
-                documents = self.mongo_service.find_all(self.collection_name)
-                for doc in documents:
-                    doc["_id"] = str(doc["_id"])  # Convert ObjectId to string
-                   
+                # ObjectIds are serialized by the renderer
+                documents = self.mongo_service.find_all(self.collection_name, projection, raw=self.wants_raw(request))
                 return Response(documents, status=status.HTTP_200_OK)
             except Exception as e:
                 return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-    def put(self, request, pk):
-        """Update a learning path by ID."""
+    def get_detail(self, request, pk, projection):
+        """Single learning path with an ETag; If-None-Match is answered from the version alone."""
+        variant = detail_variant(request.query_params, request.accepted_renderer.format)
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match:
+            version = self.mongo_service.get_version(self.collection_name, pk)
+            if version is None:
+                return Response({"error": "Learning path not found."}, status=status.HTTP_404_NOT_FOUND)
+            etag = not_modified_etag(if_none_match, pk, version, variant)
+            if etag:
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        projection, hide_version = version_projection(projection)
+        document = self.mongo_service.find_by_id(self.collection_name, pk, projection, raw=self.wants_raw(request))
+        if not document:
+            return Response({"error": "Learning path not found."}, status=status.HTTP_404_NOT_FOUND)
+        etag = make_etag(pk, document.get(VERSION_FIELD, 0), variant)
+        if hide_version and isinstance(document, dict):
+            document.pop(VERSION_FIELD, None)
+        return Response(document, status=status.HTTP_200_OK, headers={"ETag": etag})
+
+    def get_page(self, request, projection=None):
+        """Keyset-paginated listing: ?limit=<n>&after=<last _id of previous page>."""
         try:
-            update_data = request.data
-            existing_data = self.mongo_service.find_by_id(self.collection_name, pk)
+            limit = int(request.query_params.get("limit", self.default_page_size))
+        except ValueError:
+            return Response({"error": "limit must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1:
+            return Response({"error": "limit must be positive."}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(limit, self.max_page_size)
 
-            if not existing_data:
-                return Response({"error": "No document found with the given ID."}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            documents, next_cursor = self.mongo_service.find_page(
+                self.collection_name, limit, after=request.query_params.get("after"), projection=projection,
+                raw=self.wants_raw(request)
+            )
+        except InvalidId:
+            return Response({"error": "Invalid cursor."}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        return Response({"results": documents, "next": next_cursor}, status=status.HTTP_200_OK)
+
+    def put(self, request, pk):
+        """
+        Update a learning path by ID in a single find_one_and_update. Send If-Match
+        with the ETag from GET and the update is refused with 412 if someone else
+        saved in between. A "version" in the body is ignored: GET returns it, so
+        a document sent back as read must not become a conditional update.
+        """
+        update_data = request.data
+        expected_version = None
+        if_match = request.headers.get("If-Match")
+        if if_match:
+            expected_version = if_match_version(if_match, pk)
+            if expected_version is None:
+                return Response({"error": "If-Match does not name a version of this learning path."},
+                                status=status.HTTP_412_PRECONDITION_FAILED)
+            if expected_version == "*":
+                expected_version = None
 
+        try:
             # Calculate new progress based on completed topics
             all_topics = [topic for unit in update_data["learningPath"] for topic in unit["topics"]]
             completed_topics = sum(1 for topic in all_topics if topic["completed"])
             progress_percentage = round((completed_topics / len(all_topics))*1,1) if all_topics else 0.0
 
+            if expected_version is None and buffering_enabled():
+                return self.put_buffered(request, pk, update_data["learningPath"], progress_percentage)
 
-
-            # modified_count = self.mongo_service.update_one(self.collection_name, pk, update_data)
-            modified_count = self.mongo_service.update_one(
-            self.collection_name, pk,
-            {
-                "learningPath": update_data["learningPath"],
-                "progress": progress_percentage
-            }
-        )
-            if modified_count:
-                return Response({"message": "Learning path updated successfully!", "progress": progress_percentage}, status=status.HTTP_200_OK)
-            else:
-                return Response({"error": "No document found with the given ID."}, status=status.HTTP_404_NOT_FOUND)
+            document = self.mongo_service.update_versioned(
+                self.collection_name, pk,
+                {
+                    "learningPath": update_data["learningPath"],
+                    "progress": progress_percentage,
+                    "completedTopics": completed_topics,
+                    "totalTopics": len(all_topics)
+                },
+                expected_version,
+            )
+        except VersionConflict as e:
+            return Response({"error": "Learning path was changed by another request; reload it and retry.",
+                             "version": e.current_version},
+                            status=status.HTTP_412_PRECONDITION_FAILED,
+                            headers={"ETag": make_etag(pk, e.current_version)})
+        except InvalidId:
+            return Response({"error": "Invalid learning path ID."}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        
 
+        if document is None:
+            return Response({"error": "No document found with the given ID."}, status=status.HTTP_404_NOT_FOUND)
+        record_progress([document])
+        return Response({"message": "Learning path updated successfully!", "progress": progress_percentage,
+                         "data": document},
+                        status=status.HTTP_200_OK, headers={"ETag": make_etag(pk, document[VERSION_FIELD])})
+
+    def put_buffered(self, request, pk, learning_path, progress):
+        """
+        Hand an unconditional update to the write buffer. Answers 202 before the
+        write reaches Mongo unless ?sync=1 (or the buffer's synchronous option) waits for the flush.
+        """
+        buffer = get_write_buffer()
+        try:
+            written = buffer.replace(pk, learning_path, wait=request.query_params.get("sync") in ("1", "true"))
+        except InvalidId:
+            return Response({"error": "Invalid learning path ID."}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        if written is None:
+            return Response({"message": "Learning path update queued.", "progress": progress},
+                            status=status.HTTP_202_ACCEPTED)
+        if not written:
+            return Response({"error": "No document found with the given ID."}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"message": "Learning path updated successfully!", "progress": progress},
+                        status=status.HTTP_200_OK)
 
     def delete(self, request, pk):
         """Delete a learning path by ID."""
@@ -104,3 +364,109 @@ class LearningPathView(APIView):
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+
+class TopicCompletionView(APIView):
+    """
+    Marks a single topic as completed (or not) without rewriting the learning path.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.mongo_service = MongoDBService()
+        self.collection_name = 'learning_paths'
+
+    def patch(self, request, pk, unit, topic):
+        """Set topic `topic` of unit `unit`; toggles it when no "completed" value is sent."""
+        completed = request.data.get("completed") if isinstance(request.data, dict) else None
+        if completed is not None and not isinstance(completed, bool):
+            return Response({"error": "completed must be true or false."}, status=status.HTTP_400_BAD_REQUEST)
+        if buffering_enabled():
+            return self.patch_buffered(request, pk, unit, topic, completed)
+        try:
+            counters = self.mongo_service.set_topic_completed(self.collection_name, pk, unit, topic, completed)
+        except InvalidId:
+            return Response({"error": "Invalid learning path ID."}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        if counters is None:
+            return Response({"error": "No topic found at the given position."}, status=status.HTTP_404_NOT_FOUND)
+        record_progress([{"_id": ObjectId(pk), **counters}])
+        counters.pop("classID", None)
+        return Response({"message": "Topic updated successfully!", **counters}, status=status.HTTP_200_OK)
+
+    def patch_buffered(self, request, pk, unit, topic, completed):
+        """Queue the tick in the write buffer, where clicks on the same path are merged into one update."""
+        buffer = get_write_buffer()
+        try:
+            written = buffer.set_topic(pk, unit, topic, completed, wait=request.query_params.get("sync") in ("1", "true"))
+        except InvalidId:
+            return Response({"error": "Invalid learning path ID."}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        if written is None:
+            return Response({"message": "Topic update queued."}, status=status.HTTP_202_ACCEPTED)
+        if not written:
+            return Response({"error": "No topic found at the given position."}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"message": "Topic updated successfully!"}, status=status.HTTP_200_OK)
+
+
+class LearningPathSummaryView(APIView):
+    """
+    Progress numbers for a class dashboard: GET /summary/?classID=<id> returns
+    per-path and average progress without the learningPath arrays.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.mongo_service = MongoDBService()
+        self.collection_name = 'learning_paths'
+
+    def get(self, request):
+        class_id = request.query_params.get("classID")
+        if not class_id:
+            return Response({"error": "classID is required."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            summary = self.mongo_service.class_summary(self.collection_name, class_id)
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response(summary, status=status.HTTP_200_OK)
+
+
+class LearningPathHistoryView(APIView):
+    """
+    Daily progress of one learning path from the progress event log:
+    GET /<pk>/history/?from=YYYY-MM-DD&to=YYYY-MM-DD[&events=1].
+    """
+
+    def get(self, request, pk):
+        try:
+            ObjectId(pk)
+            first, last = parse_range(request.query_params.get("from"), request.query_params.get("to"))
+        except InvalidId:
+            return Response({"error": "Invalid learning path ID."}, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        include_events = request.query_params.get("events") in ("1", "true")
+        days = path_history(pk, first, last, include_events)
+        return Response({"pathId": pk, "from": first.date(), "to": last.date(), "days": days},
+                        status=status.HTTP_200_OK)
+
+
+class ClassProgressHistoryView(APIView):
+    """
+    Daily progress across a class's learning paths from the progress event log:
+    GET /history/?classID=<id>&from=YYYY-MM-DD&to=YYYY-MM-DD.
+    """
+
+    def get(self, request):
+        class_id = request.query_params.get("classID")
+        if not class_id:
+            return Response({"error": "classID is required."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            first, last = parse_range(request.query_params.get("from"), request.query_params.get("to"))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        days = class_history(class_id, first, last)
+        return Response({"classID": class_id, "from": first.date(), "to": last.date(), "days": days},
+                        status=status.HTTP_200_OK)
@@ -0,0 +1,328 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from bson.objectid import ObjectId
+from django.conf import settings
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError, WriteError
+
+from backend.mongo_metrics import Counter, Histogram, LATENCY_BUCKETS, register
+from db_connection import get_db
+from .mongodb_services import TOGGLE, coalesced_update_pipeline
+from .progress_events import record_progress
+
+# Write-behind buffer for learning path edits. Topic ticks and whole-path
+# replacements are merged per learning path in memory and written as one
+# unordered bulk_write every flush_interval_ms, or sooner once max_ops
+# changes are waiting, so a burst of clicks on one path costs one update.
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "enabled": False,
+    "flush_interval_ms": 200,
+    "max_ops": 500,
+    "synchronous": False,  # Make every write wait for its flush, as ?sync=1 does per request
+}
+
+SUBMITTED = Counter("learning_path_buffer_submitted_total", "Changes submitted to the write buffer.", "collection")
+WRITTEN = Counter("learning_path_buffer_written_total", "Learning path updates sent by buffer flushes.", "collection")
+MISSING = Counter("learning_path_buffer_missing_total", "Buffered updates whose learning path no longer exists.",
+                  "collection")
+FAILED = Counter("learning_path_buffer_failed_total", "Buffered changes lost to failed flushes.", "collection")
+FLUSH_SECONDS = Histogram("learning_path_buffer_flush_seconds", "Duration of write buffer flushes.", "collection",
+                          LATENCY_BUCKETS)
+register(SUBMITTED, WRITTEN, MISSING, FAILED, FLUSH_SECONDS)
+
+
+class WriteBuffer:
+    """Coalesces learning path changes per document and flushes them with bulk_write."""
+
+    known_ids_limit = 10000  # Learning paths remembered as existing, so queued writes skip the lookup
+
+    def __init__(self, collection_name, flush_interval_ms, max_ops, synchronous=False):
+        self.collection_name = collection_name
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_ops = max_ops
+        self.synchronous = synchronous
+        # ObjectId -> {"learningPath": list or None, "topics": {(unit, topic): value}, "ops": int, "waiters": [Future]}
+        self._pending = {}
+        self._pending_ops = 0
+        self._known = OrderedDict()  # ObjectIds seen to exist, least recently confirmed first
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()  # Flushes run one at a time, so changes land in submit order
+        self._thread = None
+        self._closed = False
+        self._stats = {"submitted": 0, "written": 0, "coalesced": 0, "missing": 0, "failed": 0, "flushes": 0,
+                       "flush_ms": 0.0, "max_flush_ms": 0.0}
+
+    def _start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="learning-path-write-buffer", daemon=True)
+            self._thread.start()
+
+    def _remember(self, document_ids, missing=()):
+        # Caller holds self._cond
+        for document_id in document_ids:
+            self._known[document_id] = True
+            self._known.move_to_end(document_id)
+        for document_id in missing:
+            self._known.pop(document_id, None)
+        while len(self._known) > self.known_ids_limit:
+            self._known.popitem(last=False)
+
+    def _exists(self, document_id):
+        with self._cond:
+            if document_id in self._pending or document_id in self._known:
+                return True
+        if get_db()[self.collection_name].find_one({"_id": document_id}, {"_id": 1}) is None:
+            return False
+        with self._cond:
+            self._remember([document_id])
+        return True
+
+    def _has_topic(self, document_id, unit_index, topic_index):
+        """Whether the topic exists in the pending replacement of the learning path, or else in the stored one."""
+        with self._cond:
+            learning_path = self._pending.get(document_id, {}).get("learningPath")
+        if learning_path is not None:
+            return unit_index < len(learning_path) and topic_index < len(learning_path[unit_index].get("topics") or [])
+        topic_path = f"learningPath.{unit_index}.topics.{topic_index}"
+        if get_db()[self.collection_name].find_one({"_id": document_id, topic_path: {"$exists": True}},
+                                                   {"_id": 1}) is None:
+            return False
+        with self._cond:
+            self._remember([document_id])
+        return True
+
+    def _submit(self, document_id, apply, wait, exists=None):
+        """
+        Queue one change. Returns None once queued, or, when waiting for the flush,
+        True if it was written and False if the learning path does not exist; a
+        failed write is raised. A queued change to an unknown learning path is
+        refused up front with False, as is any change failing `exists(document_id)`.
+        """
+        document_id = ObjectId(document_id)  # Raises InvalidId before anything is queued
+        wait = wait or self.synchronous
+        if exists is not None:
+            if not exists(document_id):
+                return False
+        elif not wait and not self._exists(document_id):
+            return False
+        waiter = Future() if wait else None
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("The write buffer is closed.")
+            self._start()
+            entry = self._pending.setdefault(document_id, {"learningPath": None, "topics": {}, "ops": 0, "waiters": []})
+            apply(entry)
+            entry["ops"] += 1
+            if waiter is not None:
+                entry["waiters"].append(waiter)
+            self._pending_ops += 1
+            self._stats["submitted"] += 1
+            if self._pending_ops >= self.max_ops:
+                self._cond.notify()
+        SUBMITTED.inc(self.collection_name)
+        if waiter is None:
+            return None
+        # Either this flush writes the change or one already running did; both settle the waiter
+        self.flush()
+        return waiter.result()
+
+    def set_topic(self, document_id, unit_index, topic_index, completed=None, wait=False):
+        """
+        Queue setting (or toggling, when completed is None) one topic's completed flag.
+        Returns False, like a missing learning path, when the path has no such topic;
+        a replacement written elsewhere before the flush can still remove it, and the
+        flush then leaves the path unchanged.
+        """
+        key = (unit_index, topic_index)
+
+        def apply(entry):
+            topics = entry["topics"]
+            if completed is not None:
+                topics[key] = bool(completed)
+            elif key not in topics:
+                topics[key] = TOGGLE
+            elif topics[key] == TOGGLE:
+                del topics[key]  # Two toggles cancel out
+            else:
+                topics[key] = not topics[key]
+
+        return self._submit(document_id, apply, wait,
+                            lambda document_id: self._has_topic(document_id, unit_index, topic_index))
+
+    def replace(self, document_id, learning_path, wait=False):
+        """Queue replacing the whole learningPath; earlier pending changes to it are dropped."""
+        def apply(entry):
+            entry["learningPath"] = learning_path
+            entry["topics"] = {}
+
+        return self._submit(document_id, apply, wait)
+
+    def _write(self, collection, document_ids, pending):
+        """bulk_write the pending entries; returns {ObjectId: error} for the updates that failed."""
+        requests = [
+            UpdateOne({"_id": document_id},
+                      coalesced_update_pipeline(pending[document_id]["topics"], pending[document_id]["learningPath"]))
+            for document_id in document_ids
+        ]
+        try:
+            collection.bulk_write(requests, ordered=False)
+        except BulkWriteError as e:
+            # Unordered: the statements not listed in writeErrors were applied
+            errors = {document_ids[error["index"]]: WriteError(error.get("errmsg", "Write failed."),
+                                                               error.get("code"), error)
+                      for error in e.details.get("writeErrors", [])}
+            if e.details.get("writeConcernErrors"):
+                errors = {document_id: errors.get(document_id, e) for document_id in document_ids}
+            return errors
+        except PyMongoError as e:
+            return dict.fromkeys(document_ids, e)
+        return {}
+
+    def flush(self):
+        """
+        Write everything pending now and settle the waiting callers. Returns the
+        number of learning paths updated; missing ones and failed writes are not counted.
+        """
+        with self._flush_lock:
+            with self._cond:
+                pending, self._pending = self._pending, {}
+                self._pending_ops = 0
+            if not pending:
+                return 0
+            document_ids = list(pending)
+            try:
+                started = time.perf_counter()
+                collection = get_db()[self.collection_name]
+                errors = self._write(collection, document_ids, pending)
+                elapsed = time.perf_counter() - started
+                written = [document_id for document_id in document_ids if document_id not in errors]
+                missing = set()
+                if written:
+                    # An update matching nothing is not an error to bulk_write; the read-back tells.
+                    # It also returns the counters the pipelines computed, for the event log.
+                    try:
+                        documents = list(collection.find(
+                            {"_id": {"$in": written}},
+                            {"classID": 1, "completedTopics": 1, "totalTopics": 1, "progress": 1},
+                        ))
+                    except PyMongoError:
+                        logger.exception("Could not read back %d flushed learning paths.", len(written))
+                    else:
+                        found = {document["_id"] for document in documents}
+                        missing = {document_id for document_id in written if document_id not in found}
+                        written = [document_id for document_id in written if document_id in found]
+                        record_progress(documents)
+            except BaseException as e:
+                for entry in pending.values():
+                    for waiter in entry["waiters"]:
+                        waiter.set_exception(e)
+                raise
+
+            failed_ops = sum(pending[document_id]["ops"] for document_id in errors)
+            if errors:
+                logger.error("Flushing buffered changes to %d learning paths failed: %s",
+                             len(errors), next(iter(errors.values())))
+            FLUSH_SECONDS.observe(self.collection_name, elapsed)
+            WRITTEN.inc(self.collection_name, len(written))
+            if missing:
+                MISSING.inc(self.collection_name, len(missing))
+            if failed_ops:
+                FAILED.inc(self.collection_name, failed_ops)
+            with self._cond:
+                self._remember(written, missing)
+                self._stats["flushes"] += 1
+                self._stats["written"] += len(written)
+                self._stats["coalesced"] += sum(pending[document_id]["ops"] for document_id in written)
+                self._stats["missing"] += len(missing)
+                self._stats["failed"] += failed_ops
+                self._stats["flush_ms"] += elapsed * 1000
+                self._stats["max_flush_ms"] = max(self._stats["max_flush_ms"], elapsed * 1000)
+
+            for document_id, entry in pending.items():
+                for waiter in entry["waiters"]:
+                    if document_id in errors:
+                        waiter.set_exception(errors[document_id])
+                    else:
+                        waiter.set_result(document_id not in missing)
+            return len(written)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed or self._pending_ops >= self.max_ops, self.flush_interval)
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Write buffer flush failed.")
+
+    def close(self):
+        """Stop the flusher thread and write whatever is still pending."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats["pending_ops"] = self._pending_ops
+        flushes = stats["flushes"] or 1
+        stats["avg_flush_ms"] = round(stats["flush_ms"] / flushes, 3)
+        # Changes per document update written; 1.0 means nothing was coalesced
+        stats["coalescing_ratio"] = round(stats["coalesced"] / stats["written"], 2) if stats["written"] else None
+        return stats
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "LEARNING_PATH_WRITE_BUFFER", {})}
+
+
+def buffering_enabled():
+    return get_config()["enabled"]
+
+
+def get_write_buffer():
+    """The process-wide buffer for learning_paths, created on first use and flushed at exit."""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                config = get_config()
+                _buffer = WriteBuffer("learning_paths", config["flush_interval_ms"], config["max_ops"],
+                                      config["synchronous"])
+    return _buffer
+
+
+@atexit.register
+def _flush_at_exit():
+    # Resolves the buffer at exit time, so forked workers never flush a copy of the parent's
+    if _buffer is not None:
+        _buffer.close()
+
+
+def _reset_after_fork():
+    # Pending changes belong to the parent, which flushes them itself
+    global _buffer, _buffer_lock
+    _buffer = None
+    _buffer_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,204 @@
+import inspect
+from asgiref.sync import sync_to_async
+from pymongo.errors import DuplicateKeyError
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from db_connection import get_async_db, duplicate_key_field
+from learning_paths.async_views import AsyncAPIView, json_response
+from .hashing import verify_password
+from .models import identity_pipeline, search_keys, PRIVATE_FIELDS_PROJECTION
+from .serializers import TeacherSerializer, StudentSerializer, LoginSerializer, LoginCredentialsSerializer
+
+# Async counterparts of the list/detail/login views in views.py, routed when
+# settings.ASYNC_VIEWS is enabled. Password hashing still runs on the bounded
+# hashing pool; it is awaited from a worker thread so the event loop stays free.
+
+
+async def run_blocking(func, *args):
+    # thread_sensitive=False lets concurrent requests hash in parallel
+    return await sync_to_async(func, thread_sensitive=False)(*args)
+
+
+def api_error(exc):
+    """Render a DRF APIException raised outside DRF's request cycle."""
+    response = json_response({"detail": str(exc.detail)}, status=exc.status_code)
+    if getattr(exc, "wait", None):
+        response["Retry-After"] = "%d" % exc.wait
+    return response
+
+
+class AsyncAccountListCreateView(AsyncAPIView):
+    collection_name = None
+    serializer_class = None
+    account_label = None
+    # (unique field, label used in the duplicate error message)
+    secondary_key = None
+
+    async def get(self, request, format=None):
+        cursor = get_async_db()[self.collection_name].find({}, PRIVATE_FIELDS_PROJECTION)  # Avoid returning _id and password hashes
+        return json_response([doc async for doc in cursor])
+
+    async def post(self, request, format=None):
+        try:
+            data = self.parse_body(request)
+        except ValueError:
+            return json_response({"error": "Invalid JSON."}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = self.serializer_class(data=data)
+        try:
+            # Validation hashes the password
+            is_valid = await run_blocking(serializer.is_valid)
+        except APIException as e:
+            return api_error(e)
+        if not is_valid:
+            return json_response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            account = dict(serializer.validated_data)
+            account["searchKeys"] = search_keys(account)
+            await get_async_db()[self.collection_name].insert_one(account)
+        except DuplicateKeyError as e:
+            field, label = self.secondary_key
+            detail = label if duplicate_key_field(e) == field else "email"
+            return json_response({"error": f"A {self.account_label} with this {detail} already exists."},
+                                 status=status.HTTP_400_BAD_REQUEST)
+        return json_response(
+            {"message": f"{self.account_label.capitalize()} account created successfully.", "data": serializer.data},
+            status=status.HTTP_201_CREATED
+        )
+
+
+class AsyncAccountDetailView(AsyncAPIView):
+    collection_name = None
+    serializer_class = None
+    account_label = None
+
+    async def get(self, request, email, format=None):
+        account = await get_async_db()[self.collection_name].find_one({"email": email}, PRIVATE_FIELDS_PROJECTION)
+        if account:
+            return json_response(account)
+        return json_response({"detail": f"{self.account_label.capitalize()} not found."},
+                             status=status.HTTP_404_NOT_FOUND)
+
+    async def put(self, request, email, format=None):
+        try:
+            data = self.parse_body(request)
+        except ValueError:
+            return json_response({"error": "Invalid JSON."}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = self.serializer_class(data=data)
+        try:
+            is_valid = await run_blocking(serializer.is_valid)
+        except APIException as e:
+            return api_error(e)
+        if not is_valid:
+            return json_response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        updated = dict(serializer.validated_data)
+        try:
+            result = await get_async_db()[self.collection_name].update_one(
+                {"email": email}, {"$set": {**updated, "searchKeys": search_keys(updated)}})
+        except DuplicateKeyError as e:
+            return json_response(
+                {"error": f"Another {self.account_label} already uses this {duplicate_key_field(e) or 'email'}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not result.matched_count:
+            return json_response({"detail": f"{self.account_label.capitalize()} not found."},
+                                 status=status.HTTP_404_NOT_FOUND)
+        return json_response(updated)
+
+    async def delete(self, request, email, format=None):
+        result = await get_async_db()[self.collection_name].delete_one({"email": email})
+        if result.deleted_count > 0:
+            return json_response({"detail": f"{self.account_label.capitalize()} deleted successfully."},
+                                 status=status.HTTP_204_NO_CONTENT)
+        return json_response({"detail": f"{self.account_label.capitalize()} not found."},
+                             status=status.HTTP_404_NOT_FOUND)
+
+
+class AsyncTeacherListCreateView(AsyncAccountListCreateView):
+    collection_name = "teachers"
+    serializer_class = TeacherSerializer
+    account_label = "teacher"
+    secondary_key = ("employeeID", "employee ID")
+
+
+class AsyncStudentListCreateView(AsyncAccountListCreateView):
+    collection_name = "students"
+    serializer_class = StudentSerializer
+    account_label = "student"
+    secondary_key = ("enrollmentNumber", "enrollment number")
+
+
+class AsyncTeacherDetailView(AsyncAccountDetailView):
+    collection_name = "teachers"
+    serializer_class = TeacherSerializer
+    account_label = "teacher"
+
+    async def get(self, request, teacher_email, format=None):
+        return await super().get(request, teacher_email)
+
+    async def put(self, request, teacher_email, format=None):
+        return await super().put(request, teacher_email)
+
+    async def delete(self, request, teacher_email, format=None):
+        return await super().delete(request, teacher_email)
+
+
+class AsyncStudentDetailView(AsyncAccountDetailView):
+    collection_name = "students"
+    serializer_class = StudentSerializer
+    account_label = "student"
+
+    async def get(self, request, student_email, format=None):
+        return await super().get(request, student_email)
+
+    async def put(self, request, student_email, format=None):
+        return await super().put(request, student_email)
+
+    async def delete(self, request, student_email, format=None):
+        return await super().delete(request, student_email)
+
+
+class AsyncLoginView(AsyncAPIView):
+    """
+    Handles user login with a single awaited identity lookup.
+    """
+
+    async def post(self, request, format=None):
+        try:
+            data = self.parse_body(request)
+        except ValueError:
+            return json_response({"error": "Invalid JSON."}, status=status.HTTP_400_BAD_REQUEST)
+        # Field checks only; the account lookup below is awaited instead of LoginSerializer.validate
+        serializer = LoginCredentialsSerializer(data=data)
+        if not serializer.is_valid():
+            return json_response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        email = serializer.validated_data["email"]
+        password = serializer.validated_data["password"]
+
+        collections = LoginSerializer.identity_collections
+        cursor = get_async_db()[collections[0]].aggregate(identity_pipeline(email, collections))
+        if inspect.isawaitable(cursor):  # pymongo's async API awaits aggregate(); motor does not
+            cursor = await cursor
+        user = None
+        async for user in cursor:
+            break
+
+        try:
+            if not user or not await run_blocking(verify_password, password, user["password"]):
+                return json_response({"detail": "Invalid email or password."}, status=status.HTTP_401_UNAUTHORIZED)
+        except APIException as e:
+            return api_error(e)
+
+        user_data = LoginSerializer().build_login_data(user)
+        return json_response(
+            {
+                "message": "Login successful",
+                "access_token": user_data['access_token'],
+                "refresh_token": user_data['refresh_token'],
+                "role": user_data.get("role", "user"),  # Role (e.g., 'teacher', 'student')
+                "employeeID": user_data.get("employeeID", None),
+                "classID": user_data.get("classID", None)
+            },
+            status=status.HTTP_200_OK
+        )
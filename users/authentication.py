@@ -0,0 +1,121 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import jwt
+from django.conf import settings
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.exceptions import AuthenticationFailed
+
+
+class TokenUser:
+    """Request user built from verified JWT claims; no database lookup involved."""
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, payload):
+        self.payload = payload
+        self.id = payload.get("user_id")
+        self.email = payload.get("email")
+        self.role = payload.get("role")
+
+    def __str__(self):
+        return self.email or str(self.id)
+
+
+class VerifiedTokenCache:
+    """
+    LRU cache of decoded token payloads keyed by a digest of the token.
+
+    Entries are dropped once the token's `exp` has passed, so a cache hit
+    never outlives the token's validity. Payloads go in and come out as
+    copies, so a caller changing its claims cannot affect later requests.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            payload, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(payload)
+
+    def set(self, key, payload, expires_at):
+        with self._lock:
+            self._entries[key] = (dict(payload), expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+_cache = VerifiedTokenCache(settings.JWT_AUTH.get("VERIFIED_TOKEN_CACHE_SIZE", 1024))
+
+
+def decode_token(token):
+    """
+    Verify and decode a JWT, reusing the result for tokens seen before.
+    Raises jwt.ExpiredSignatureError / jwt.InvalidTokenError like jwt.decode.
+    """
+    if isinstance(token, str):
+        token = token.encode()
+    key = hashlib.sha256(token).digest()
+    payload = _cache.get(key)
+    if payload is not None:
+        return payload
+
+    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.JWT_AUTH["ALGORITHM"]])
+    # Tokens without an expiry are never cached
+    if "exp" in payload:
+        _cache.set(key, payload, payload["exp"])
+    return payload
+
+
+def token_cache_stats():
+    return _cache.stats()
+
+
+class JWTAuthentication(BaseAuthentication):
+    """
+    Authenticates `Authorization: Bearer <token>` headers issued by LoginView.
+    Requests without the header are left anonymous for the permission classes to decide.
+    """
+
+    keyword = b"bearer"
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword:
+            return None
+        if len(auth) != 2:
+            raise AuthenticationFailed("Invalid token header.")
+
+        try:
+            payload = decode_token(auth[1])
+        except jwt.ExpiredSignatureError:
+            raise AuthenticationFailed("Token has expired.")
+        except jwt.InvalidTokenError:
+            raise AuthenticationFailed("Invalid token.")
+        return TokenUser(payload), payload
+
+    def authenticate_header(self, request):
+        return "Bearer"
@@ -0,0 +1,121 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password, check_password
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+# PBKDF2 runs in hashlib with the GIL released, so a thread pool is enough
+# to keep password work off the request threads.
+DEFAULTS = {
+    "max_workers": 4,
+    "max_queue": 32,
+    "retry_after": 1,  # Seconds clients are told to wait when the queue is full
+}
+
+
+class HashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many login or signup requests, please retry shortly."
+    default_code = "hashing_busy"
+
+    def __init__(self, wait):
+        super().__init__()
+        # DRF's exception handler turns `wait` into a Retry-After header
+        self.wait = wait
+
+
+class PasswordHasher:
+    """Runs make_password/check_password on a bounded worker pool."""
+
+    def __init__(self, max_workers, max_queue, retry_after):
+        self.max_workers = max_workers
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash")
+        # Running plus queued jobs; anything beyond this is rejected immediately
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self._stats = {"completed": 0, "rejected": 0, "queue_wait_ms": 0.0, "hash_ms": 0.0}
+
+    def _timed(self, func, args, submitted_at):
+        started_at = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            finished_at = time.perf_counter()
+            with self._lock:
+                self._stats["completed"] += 1
+                self._stats["queue_wait_ms"] += (started_at - submitted_at) * 1000
+                self._stats["hash_ms"] += (finished_at - started_at) * 1000
+            self._slots.release()
+
+    def run(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats["rejected"] += 1
+            raise HashingBusy(self.retry_after)
+        try:
+            future = self._executor.submit(self._timed, func, args, time.perf_counter())
+        except RuntimeError:
+            self._slots.release()
+            raise
+        return future.result()
+
+    def map(self, func, arg_tuples):
+        """
+        Run func over many argument tuples for bulk jobs. Unlike run(), this waits
+        for free slots instead of failing, and keeps at most max_workers jobs in
+        flight so the queue still has room for interactive logins.
+        """
+        window = threading.BoundedSemaphore(self.max_workers)
+        futures = []
+        for args in arg_tuples:
+            window.acquire()
+            self._slots.acquire()
+            future = self._executor.submit(self._timed, func, args, time.perf_counter())
+            future.add_done_callback(lambda _: window.release())
+            futures.append(future)
+        return [future.result() for future in futures]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        completed = stats["completed"] or 1
+        stats["avg_queue_wait_ms"] = round(stats["queue_wait_ms"] / completed, 3)
+        stats["avg_hash_ms"] = round(stats["hash_ms"] / completed, 3)
+        return stats
+
+
+_hasher = None
+_hasher_lock = threading.Lock()
+
+
+def get_hasher():
+    global _hasher
+    if _hasher is None:
+        with _hasher_lock:
+            if _hasher is None:
+                options = {**DEFAULTS, **getattr(settings, "PASSWORD_HASHING", {})}
+                _hasher = PasswordHasher(**options)
+    return _hasher
+
+
+def hash_password(raw_password):
+    """make_password() on the hashing pool; raises HashingBusy when it is saturated."""
+    return get_hasher().run(make_password, raw_password)
+
+
+def verify_password(raw_password, encoded):
+    """check_password() on the hashing pool; raises HashingBusy when it is saturated."""
+    return get_hasher().run(check_password, raw_password, encoded)
+
+
+def hash_passwords(raw_passwords):
+    """make_password() for many passwords in parallel, waiting for pool capacity."""
+    return get_hasher().map(make_password, [(raw,) for raw in raw_passwords])
+
+
+def hashing_stats():
+    return get_hasher().stats()
@@ -0,0 +1,56 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+
+from backend.benchmarks import percentile
+from db_connection import get_db
+from users.views import StudentSearchView, TeacherSearchView
+
+VIEWS = {"students": StudentSearchView, "teachers": TeacherSearchView}
+
+
+class Command(BaseCommand):
+    help = (
+        "Time directory search requests for a set of typeahead prefixes against the configured "
+        "MongoDB and compare p95 with DIRECTORY_SEARCH['latency_target_ms']."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--collection", choices=sorted(VIEWS), default="students")
+        parser.add_argument("--prefixes", default="a,an,ann,j,jo,s,sa,m,r,k",
+                            help="Comma-separated search terms, as a user would type them.")
+        parser.add_argument("--repeat", type=int, default=50)
+        parser.add_argument("--department")
+        parser.add_argument("--limit", type=int, default=20)
+
+    def handle(self, *args, **options):
+        collection = options["collection"]
+        if not get_db()[collection].find_one({"searchKeys": {"$exists": True}}, {"_id": 1}):
+            raise CommandError(f"{collection} has no searchKeys; run `manage.py mongo_migrate` first.")
+
+        view = VIEWS[collection].as_view()
+        factory = RequestFactory()
+        params = {"limit": options["limit"]}
+        if options["department"]:
+            params["department"] = options["department"]
+
+        latencies = []
+        for _ in range(options["repeat"]):
+            for prefix in filter(None, options["prefixes"].split(",")):
+                request = factory.get(f"/api/{collection}/search/", {**params, "q": prefix})
+                started = time.perf_counter()
+                response = view(request)
+                response.render()
+                latencies.append(time.perf_counter() - started)
+
+        latencies.sort()
+        p50 = percentile(latencies, 50) * 1000
+        p95 = percentile(latencies, 95) * 1000
+        target = settings.DIRECTORY_SEARCH["latency_target_ms"]
+        self.stdout.write(f"{collection}: {len(latencies)} requests, p50 {p50:.2f} ms, p95 {p95:.2f} ms (target {target} ms)")
+        if p95 > target:
+            self.stdout.write(self.style.WARNING("p95 is above the target; check the searchKeys indexes with explain()."))
+        else:
+            self.stdout.write(self.style.SUCCESS("p95 is within the target."))
@@ -1,5 +1,7 @@
-from django.contrib.auth.hashers import make_password, check_password
+from .hashing import hash_password, verify_password
+from .authentication import decode_token
 from db_connection import db
+from pymongo.errors import DuplicateKeyError
 # from rest_framework_simplejwt.tokens import RefreshToken
 from bson import ObjectId
 from django.conf import settings
@@ -10,12 +12,65 @@ SECRET_KEY = settings.SECRET_KEY  # Ensure it's set in settings.py
 ALGORITHM = "HS256"
 TOKEN_EXPIRATION_HOURS = 24
 
+# Lower-cased values (and the words of each) are stored in `searchKeys`
+# so directory search can prefix-match them through one multikey index
+SEARCH_KEY_FIELDS = ("name", "email", "enrollmentNumber", "employeeID")
+
+# Fields kept out of every directory response
+PRIVATE_FIELDS_PROJECTION = {"_id": 0, "password": 0, "searchKeys": 0}
+
+
+def search_keys(account):
+    """Return the searchKeys array for a teacher or student document."""
+    keys = set()
+    for field in SEARCH_KEY_FIELDS:
+        value = account.get(field)
+        if value:
+            value = str(value).lower()
+            keys.add(value)
+            keys.update(value.split())
+    return sorted(keys)
+
+
+# Collection an account lives in -> role reported for it
+COLLECTION_ROLES = {"students": "student", "teachers": "teacher"}
+
+
+def identity_pipeline(email, collections):
+    """
+    Aggregation (run on collections[0]) that finds an account by email across
+    several collections in one round trip.
+
+    Each collection is probed with an indexed email match and combined with
+    $unionWith; the first collection in `collections` that has the email wins.
+    The returned document carries the collection it came from in `_collection`.
+    """
+    def branch(rank, name):
+        return [
+            {"$match": {"email": email}},
+            {"$limit": 1},
+            {"$addFields": {"_collection": name, "_rank": rank}},
+        ]
+
+    first, *rest = collections
+    pipeline = branch(0, first)
+    for rank, name in enumerate(rest, start=1):
+        pipeline.append({"$unionWith": {"coll": name, "pipeline": branch(rank, name)}})
+    pipeline += [{"$sort": {"_rank": 1}}, {"$limit": 1}, {"$project": {"_rank": 0}}]
+    return pipeline
+
+
+def find_identity(email, collections=("users", "teachers", "students")):
+    """Return the account for `email` from the first of `collections` holding it, or None."""
+    return next(db[collections[0]].aggregate(identity_pipeline(email, collections)), None)
+
+
 class BaseUser:
     def __init__(self, role, name, email, password, user_id=None):
         self.role = role
         self.name = name
         self.email = email
-        self.password = make_password(password) if not password.startswith('pbkdf2') else password
+        self.password = hash_password(password) if not password.startswith('pbkdf2') else password
         self.user_id = user_id  # Ensure user_id is assigned here
 
     @property
@@ -65,20 +120,10 @@ class BaseUser:
     @staticmethod
     def authenticate(email, password):
         """Authenticate user based on email and password."""
-        # First check in the general users collection
-        user_collection = db["users"]
-        user = user_collection.find_one({"email": email})
-
-
-        if not user:
-            # If not found in the general users collection, check the teachers collection
-            user = db["teachers"].find_one({"email": email})
+        # Searches users, then teachers, then students in a single query
+        user = find_identity(email)
 
-        if not user:
-            # If not found in the teachers collection, check the students collection
-            user = db["students"].find_one({"email": email})
-
-        if user and check_password(password, user["password"]):
+        if user and verify_password(password, user["password"]):
             
             user_id = str(user["_id"]) if isinstance(user["_id"], ObjectId) else user["_id"]
 
@@ -121,7 +166,7 @@ class BaseUser:
     def decode_jwt_token(token):
         """Decode and verify the JWT token."""
         try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            payload = decode_token(token)
             return payload  # Contains user_id, email, role
         except jwt.ExpiredSignatureError:
             return {"error": "Token expired"}
@@ -135,11 +180,7 @@ class Teacher(BaseUser):
         self.employeeID = employeeID
 
     def save(self):
-        """Save the teacher's data after ensuring employeeID is unique."""
-        # Check if the employee ID already exists in the collection
-        if db["teachers"].find_one({"employeeID": self.employeeID, "email": {"$ne": self.email}}):
-            raise ValueError(f"Teacher with employee ID {self.employeeID} already exists.")
-
+        """Save the teacher's data; the unique employeeID index rejects duplicates."""
         # Save the Teacher document to the MongoDB collection
         teacher_collection = db["teachers"]
         teacher_data = {
@@ -149,7 +190,11 @@ class Teacher(BaseUser):
             "password": self.password,
             "employeeID": self.employeeID
         }
-        teacher_collection.update_one({"email": self.email}, {"$set": teacher_data}, upsert=True)
+        teacher_data["searchKeys"] = search_keys(teacher_data)
+        try:
+            teacher_collection.update_one({"email": self.email}, {"$set": teacher_data}, upsert=True)
+        except DuplicateKeyError:
+            raise ValueError(f"Teacher with employee ID {self.employeeID} already exists.")
 
     def __str__(self):
         return f"{self.name} - {self.employeeID}"
@@ -164,11 +209,7 @@ class Student(BaseUser):
         self.class_code = class_code
 
     def save(self):
-        """Save the student's data after ensuring enrollmentNumber is unique."""
-        # Check if the enrollment number already exists in the collection
-        if db["students"].find_one({"enrollmentNumber": self.enrollmentNumber, "email": {"$ne": self.email}}):
-            raise ValueError(f"Student with enrollment number {self.enrollmentNumber} already exists.")
-
+        """Save the student's data; the unique enrollmentNumber index rejects duplicates."""
         # Save the Student document to the MongoDB collection
         student_collection = db["students"]
         student_data = {
@@ -180,7 +221,11 @@ class Student(BaseUser):
             "department": self.department,
             "class_code": self.class_code
         }
-        student_collection.update_one({"email": self.email}, {"$set": student_data}, upsert=True)
+        student_data["searchKeys"] = search_keys(student_data)
+        try:
+            student_collection.update_one({"email": self.email}, {"$set": student_data}, upsert=True)
+        except DuplicateKeyError:
+            raise ValueError(f"Student with enrollment number {self.enrollmentNumber} already exists.")
 
     def update_class_code(self, new_class_code):
         class_exists = db["learning_paths"].find_one({"classID": new_class_code})
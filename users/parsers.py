@@ -0,0 +1,30 @@
+import codecs
+import csv
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class CSVParser(BaseParser):
+    """
+    Parses a CSV body with a header row into a list of dicts.
+    """
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            return parse_csv(stream, encoding)
+        except (UnicodeDecodeError, csv.Error) as exc:
+            raise ParseError('CSV parse error - %s' % str(exc))
+
+
+def parse_csv(stream, encoding='utf-8'):
+    # Spreadsheet exports often start with a byte order mark, which would otherwise stick to the first header
+    if codecs.lookup(encoding).name == 'utf-8':
+        encoding = 'utf-8-sig'
+    reader = csv.DictReader(codecs.getreader(encoding)(stream))
+    # Blank cells are treated as missing so required-field errors read naturally
+    return [{key.strip(): value.strip() for key, value in row.items() if key and value} for row in reader]
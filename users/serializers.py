@@ -1,9 +1,9 @@
 from rest_framework import serializers
-from django.contrib.auth.hashers import make_password, check_password
+from .hashing import hash_password, verify_password
 from db_connection import db
-from rest_framework.exceptions import ValidationError, AuthenticationFailed
+from rest_framework.exceptions import AuthenticationFailed
 from bson import ObjectId
-from .models import BaseUser
+from .models import BaseUser, find_identity, search_keys, COLLECTION_ROLES
 import datetime
 from django.conf import settings
 import jwt
@@ -24,7 +24,7 @@ class BaseUserSerializer(serializers.Serializer):
     def validate_password(self, value):
         # Ensure the password is hashed before saving
         if not value.startswith('pbkdf2'):
-            return make_password(value)
+            return hash_password(value)
         return value
 
     def create(self, validated_data):
@@ -42,23 +42,13 @@ class BaseUserSerializer(serializers.Serializer):
 class TeacherSerializer(BaseUserSerializer):
     employeeID = serializers.CharField(max_length=20)
 
-    def validate_email(self, value):
-        # Check if the email already exists for a teacher
-        existing_teacher = db["teachers"].find_one({"email": value})
-        if existing_teacher:
-            raise ValidationError("A teacher with this email already exists.")
-        return value
-
-    def validate_employeeID(self, value):
-        # Check if the employeeID already exists for a teacher
-        existing_teacher = db["teachers"].find_one({"employeeID": value})
-        if existing_teacher:
-            raise ValidationError("A teacher with this employee ID already exists.")
-        return value
+    # Uniqueness of email and employeeID is enforced by unique indexes
+    # (see backend/mongo_migrations); inserts raise DuplicateKeyError.
 
     def create(self, validated_data):
         validated_data['role'] = 'teacher'
         validated_data['password'] = self.validate_password(validated_data['password'])
+        validated_data['searchKeys'] = search_keys(validated_data)
         db["teachers"].insert_one(validated_data)
         return validated_data
 
@@ -68,53 +58,57 @@ class StudentSerializer(BaseUserSerializer):
     enrollmentNumber = serializers.CharField(max_length=20)
     department = serializers.CharField(max_length=100)
 
-    def validate_email(self, value):
-        # Check if the email already exists for a student
-        existing_student = db["students"].find_one({"email": value})
-        if existing_student:
-            raise ValidationError("A student with this email already exists.")
-        return value
-
-    def validate_enrollmentNumber(self, value):
-        # Check if the enrollmentNumber already exists for a student
-        existing_student = db["students"].find_one({"enrollmentNumber": value})
-        if existing_student:
-            raise ValidationError("A student with this enrollment number already exists.")
-        return value
+    # Uniqueness of email and enrollmentNumber is enforced by unique indexes
+    # (see backend/mongo_migrations); inserts raise DuplicateKeyError.
 
     def create(self, validated_data):
         validated_data['role'] = 'student'
         validated_data['password'] = self.validate_password(validated_data['password'])
+        validated_data['searchKeys'] = search_keys(validated_data)
         db["students"].insert_one(validated_data)
         return validated_data
 
 
-# Login Serializer
-class LoginSerializer(serializers.Serializer):
+# One row of a bulk roster import; passwords are hashed later, in parallel
+class StudentImportSerializer(StudentSerializer):
+    role = serializers.CharField(max_length=20, default='student')
+
+    def validate_password(self, value):
+        return value
+
+
+# Login credentials only, without the account lookup
+class LoginCredentialsSerializer(serializers.Serializer):
     email = serializers.EmailField()
     password = serializers.CharField(write_only=True)
 
+
+# Login Serializer
+class LoginSerializer(LoginCredentialsSerializer):
+    # Students take precedence over teachers
+    identity_collections = ("students", "teachers")
+
     def validate(self, data):
         email = data.get('email')
         password = data.get('password')
 
-        # Check if the user is in the students collection
-        user = db["students"].find_one({"email": email})
-        role = "student" if user else None
-
-        # If the user is not found in students, check teachers collection
-        if not user:
-            user = db["teachers"].find_one({"email": email})
-            role = "teacher" if user else None
+        # Resolved across all identity collections in one query
+        user = find_identity(email, collections=self.identity_collections)
 
         # If no user found, raise authentication error
         if not user:
             raise AuthenticationFailed("Invalid email or password.")
 
         # Verify the password for the found user
-        if not check_password(password, user["password"]):
+        if not verify_password(password, user["password"]):
             raise AuthenticationFailed("Invalid email or password.")
 
+        return self.build_login_data(user)
+
+    def build_login_data(self, user):
+        """Issue tokens for an authenticated account document and collect its profile fields."""
+        role = COLLECTION_ROLES[user["_collection"]]
+
         # Convert the user_id to a string if it's an ObjectId
         user_id = str(user["_id"]) if isinstance(user["_id"], ObjectId) else str(user["_id"])
 
@@ -1,3 +1,261 @@
-from django.test import TestCase
+import csv
+import importlib
+import io
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from bson import ObjectId
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework.views import exception_handler
+
+from .authentication import VerifiedTokenCache
+from .hashing import HashingBusy, PasswordHasher
+from .models import search_keys
+from .views import ClassRosterView
+from .parsers import parse_csv
+
+
+class VerifiedTokenCacheTests(SimpleTestCase):
+
+    def test_entry_expires_with_the_token(self):
+        cache = VerifiedTokenCache(max_size=10)
+        cache.set(b"key", {"email": "a@example.com"}, expires_at=time.time() + 60)
+        self.assertEqual(cache.get(b"key"), {"email": "a@example.com"})
+        with mock.patch("users.authentication.time.time", return_value=time.time() + 61):
+            self.assertIsNone(cache.get(b"key"))
+        self.assertIsNone(cache.get(b"key"))
+        self.assertEqual(cache.stats(), {"size": 0, "hits": 1, "misses": 2})
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = VerifiedTokenCache(max_size=2)
+        expires_at = time.time() + 60
+        cache.set(b"a", {}, expires_at)
+        cache.set(b"b", {}, expires_at)
+        cache.get(b"a")
+        cache.set(b"c", {}, expires_at)
+        self.assertIsNone(cache.get(b"b"))
+        self.assertIsNotNone(cache.get(b"a"))
+
+    def test_callers_get_copies(self):
+        cache = VerifiedTokenCache(max_size=10)
+        payload = {"role": "student"}
+        cache.set(b"key", payload, time.time() + 60)
+        payload["role"] = "teacher"
+        cache.get(b"key")["role"] = "admin"
+        self.assertEqual(cache.get(b"key"), {"role": "student"})
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"])
+class BearerHeaderTests(SimpleTestCase):
+
+    def test_stale_token_does_not_block_login(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION="Bearer not-a-token")
+        response = client.post("/api/login/", {}, format="json")
+        self.assertEqual(response.status_code, 400)  # Missing credentials, not 401 for the header
+
+    def test_protected_view_rejects_a_bad_token(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION="Bearer not-a-token")
+        response = client.post("/api/update_class_id/", {"classID": "C1"}, format="json")
+        self.assertEqual(response.status_code, 401)
+
+
+class FakeStudents:
+    """find/insert_many over an initially empty students collection."""
+
+    def __init__(self):
+        self.inserted = []
+
+    def find(self, query, projection=None):
+        return []
+
+    def insert_many(self, documents, ordered=True):
+        self.inserted.extend(documents)
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"])
+class StudentBulkImportTests(SimpleTestCase):
+    header = "name,email,password,enrollmentNumber,department\r\n"
+
+    def upload(self, content):
+        students = FakeStudents()
+        with mock.patch("users.views.db", {"students": students}), \
+                mock.patch("users.views.hash_passwords", side_effect=lambda passwords: ["pbkdf2"] * len(passwords)):
+            response = APIClient().post("/api/students/import/",
+                                        {"file": SimpleUploadedFile("roster.csv", content, "text/csv")},
+                                        format="multipart")
+        return response, students.inserted
+
+    def test_byte_order_mark_is_not_part_of_the_first_header(self):
+        content = ("\ufeff" + self.header + "Zoë,zoe@example.com,secret,E1,Maths\r\n").encode("utf-8")
+        self.assertEqual(parse_csv(io.BytesIO(content))[0]["name"], "Zoë")
+        response, inserted = self.upload(content)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([student["email"] for student in inserted], ["zoe@example.com"])
+
+    def test_undecodable_file_is_a_bad_request(self):
+        response, inserted = self.upload((self.header + "Zoë,zoe@example.com,secret,E1,Maths\r\n").encode("latin-1"))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("CSV parse error", response.json()["error"])
+        self.assertEqual(inserted, [])
+
+    def test_malformed_csv_is_a_bad_request(self):
+        oversized = "x" * (csv.field_size_limit() + 1)
+        response, _ = self.upload((self.header + f"Ann,ann@example.com,secret,E1,{oversized}\r\n").encode("utf-8"))
+        self.assertEqual(response.status_code, 400)
+
+    def test_each_row_is_reported(self):
+        content = (self.header + "Ann,ann@example.com,secret,E1,Maths\r\n"
+                   "Bob,not-an-email,secret,E2,Maths\r\n"
+                   "Cy,ann@example.com,secret,E3,Maths\r\n").encode("utf-8")
+        response, inserted = self.upload(content)
+        self.assertEqual(response.status_code, 207)
+        rows = response.json()["rows"]
+        self.assertEqual([row["status"] for row in rows], ["created", "error", "error"])
+        self.assertIn("email", rows[1]["errors"])
+        self.assertEqual(rows[2]["errors"]["email"], ["A student with this email already exists."])
+        self.assertEqual(len(inserted), 1)
+
+
+class SearchKeysTests(SimpleTestCase):
+
+    def test_values_and_their_words_lower_cased(self):
+        account = {"name": "Ada  Lovelace", "email": "Ada@Example.com", "employeeID": "T-1", "department": "CS"}
+        self.assertEqual(search_keys(account), ["ada", "ada  lovelace", "ada@example.com", "lovelace", "t-1"])
+
+    def test_missing_and_empty_fields_are_skipped(self):
+        self.assertEqual(search_keys({"name": "", "enrollmentNumber": 42}), ["42"])
+
+
+class FakeDirectory:
+    """Records the find() a query runs and returns `documents` in order."""
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.calls = []
+
+    def find(self, query, projection=None):
+        self.calls.append({"query": query, "projection": projection})
+        return self
+
+    def sort(self, key, direction):
+        self.calls[-1]["sort"] = [(key, direction)]
+        return self
+
+    def limit(self, limit):
+        self.calls[-1]["limit"] = limit
+        return iter([dict(document) for document in self.documents[:limit]])
+
+    def __iter__(self):
+        return iter([dict(document) for document in self.documents])
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"])
+class DirectorySearchTests(SimpleTestCase):
+
+    def search(self, path, documents=()):
+        directory = FakeDirectory(list(documents))
+        with mock.patch("users.views.db", {"students": directory, "teachers": directory}):
+            response = APIClient().get(path)
+        return response, directory.calls[-1]
+
+    def test_query_shape(self):
+        _, call = self.search("/api/students/search/?q=Ann.&department=CS&limit=5")
+        self.assertEqual(call["query"], {"searchKeys": {"$regex": "^ann\\."}, "department": "CS"})
+        self.assertEqual(call["sort"], [("_id", 1)])
+        self.assertEqual(call["limit"], 6)
+        self.assertNotIn("password", {k for k, v in call["projection"].items() if v})
+
+    def test_every_query_shape_has_an_equality_sort_range_index(self):
+        indexes = {"students": [], "teachers": []}
+        database = {name: mock.Mock(**{"find.return_value": []}) for name in indexes}
+        for name, collection in database.items():
+            collection.create_indexes.side_effect = indexes[name].extend
+        importlib.import_module("backend.mongo_migrations.0002_directory_search").apply(database)
+        keys = {name: [list(index.document["key"]) for index in models] for name, models in indexes.items()}
+        for collection, filters in (("teachers", [None]), ("students", [None, "department", "classID"])):
+            for field in filters:
+                with self.subTest(collection=collection, filter=field):
+                    self.assertIn([key for key in (field, "_id", "searchKeys") if key], keys[collection])
+
+    def test_cursor_pages_on_id(self):
+        documents = [{"_id": ObjectId(), "name": name} for name in ("a", "b", "c")]
+        response, _ = self.search("/api/teachers/search/?q=a&limit=2", documents)
+        self.assertEqual(response.json(), {"results": [{"name": "a"}, {"name": "b"}],
+                                           "next": str(documents[1]["_id"])})
+        _, call = self.search(f"/api/teachers/search/?q=a&after={documents[1]['_id']}")
+        self.assertEqual(call["query"]["_id"], {"$gt": documents[1]["_id"]})
+
+
+class PasswordHasherTests(SimpleTestCase):
+
+    def test_saturated_pool_answers_503_with_retry_after(self):
+        hasher = PasswordHasher(max_workers=1, max_queue=0, retry_after=3)
+        release = threading.Event()
+        blocked = threading.Thread(target=hasher.run, args=(release.wait,))
+        blocked.start()
+        try:
+            with self.assertRaises(HashingBusy) as raised:
+                for _ in range(100):  # Until the blocked job holds the only slot
+                    hasher.run(lambda: time.sleep(0.01))
+        finally:
+            release.set()
+            blocked.join()
+        response = exception_handler(raised.exception, {})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "3")
+        self.assertGreaterEqual(hasher.stats()["rejected"], 1)
+        self.assertEqual(hasher.run(len, "ok"), 2)  # The slot is back once the job finishes
+
+    def test_map_keeps_at_most_max_workers_in_flight(self):
+        hasher = PasswordHasher(max_workers=2, max_queue=8, retry_after=1)
+        lock = threading.Lock()
+        in_flight, peak = [0], [0]
+
+        def job(value):
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            time.sleep(0.005)
+            with lock:
+                in_flight[0] -= 1
+            return value * 2
+
+        self.assertEqual(hasher.map(job, [(n,) for n in range(20)]), [n * 2 for n in range(20)])
+        self.assertLessEqual(peak[0], 2)
+        self.assertEqual(hasher.stats()["completed"], 20)
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"], MONGO_METRICS={"enabled": True})
+class MetricsTests(SimpleTestCase):
+
+    def test_hashing_and_token_cache_are_exposed(self):
+        with mock.patch("db_connection.pool_stats", return_value={}):
+            body = APIClient().get("/metrics").content.decode()
+        for name in ("password_hash_completed_total", "password_hash_rejected_total",
+                     "jwt_token_cache_size", "jwt_token_cache_hits_total"):
+            self.assertIn(f"\n{name} ", body)
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"])
+class ClassRosterTests(SimpleTestCase):
+
+    def test_class_paths_are_read_once_per_page(self):
+        students = [{"_id": ObjectId(), "name": name, "classID": "C1"} for name in ("a", "b", "c")]
+        paths = [{"_id": ObjectId(), "title": "Algebra", "progress": 0.5}]
+        database = {"students": FakeDirectory(students), "learning_paths": FakeDirectory(paths)}
+        with mock.patch("users.views.db", database):
+            response = APIClient().get("/api/students/roster/?classID=C1&limit=2")
+        body = response.json()
+        self.assertEqual([student["name"] for student in body["results"]], ["a", "b"])
+        self.assertEqual(body["next"], str(students[1]["_id"]))
+        self.assertEqual([path["title"] for path in body["learningPaths"]], ["Algebra"])
+        self.assertEqual(database["students"].calls[0]["query"], {"classID": "C1"})
+        self.assertEqual(database["learning_paths"].calls, [{"query": {"classID": "C1"},
+                                                              "projection": ClassRosterView.path_projection,
+                                                              "sort": [("_id", 1)]}])
@@ -1,10 +1,24 @@
+from django.conf import settings
 from django.urls import path
-from .views import TeacherListCreateView, TeacherDetailView, StudentListCreateView, StudentDetailView,LoginView,UpdateClassIDView
+from .views import TeacherListCreateView, TeacherDetailView, StudentListCreateView, StudentDetailView,LoginView,UpdateClassIDView,StudentBulkImportView,TeacherSearchView,StudentSearchView,ClassRosterView
+
+if settings.ASYNC_VIEWS:
+    from .async_views import (
+        AsyncTeacherListCreateView as TeacherListCreateView,
+        AsyncTeacherDetailView as TeacherDetailView,
+        AsyncStudentListCreateView as StudentListCreateView,
+        AsyncStudentDetailView as StudentDetailView,
+        AsyncLoginView as LoginView,
+    )
 
 urlpatterns = [
     path('teachers/', TeacherListCreateView.as_view(), name='teacher-list-create'),
+    path('teachers/search/', TeacherSearchView.as_view(), name='teacher-search'),
     path('teachers/<str:teacher_email>/', TeacherDetailView.as_view(), name='teacher-detail'),
     path('students/', StudentListCreateView.as_view(), name='student-list-create'),
+    path('students/search/', StudentSearchView.as_view(), name='student-search'),
+    path('students/roster/', ClassRosterView.as_view(), name='class-roster'),
+    path('students/import/', StudentBulkImportView.as_view(), name='student-bulk-import'),
     path('students/<str:student_email>/', StudentDetailView.as_view(), name='student-detail'),
     path('login/', LoginView.as_view(), name='login'),
     path('update_class_id/', UpdateClassIDView.as_view(), name='update-class-id'),
@@ -18,6 +32,7 @@ Testing Endpoints
 Teachers:
 
 GET /teachers/ - List all teachers.
+GET /teachers/search/?q= - Prefix search on name, email or employee ID.
 POST /teachers/ - Add or update a teacher.
 GET /teachers/<teacher_email>/ - Retrieve a teacher.
 PUT /teachers/<teacher_email>/ - Update a teacher.
@@ -26,7 +41,10 @@ DELETE /teachers/<teacher_email>/ - Delete a teacher.
 Students:
 
 GET /students/ - List all students.
+GET /students/search/?q=&department=&classID= - Prefix search on name, email or enrollment number.
 POST /students/ - Add or update a student.
+POST /students/import/ - Import many students from a CSV file or JSON array.
+GET /students/roster/?classID= - A page of a class's students, with the class's learning paths and their progress.
 GET /students/<student_email>/ - Retrieve a student.
 PUT /students/<student_email>/ - Update a student.
 DELETE /students/<student_email>/ - Delete a student.
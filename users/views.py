@@ -1,11 +1,18 @@
-from .serializers import TeacherSerializer, StudentSerializer, LoginSerializer
-from db_connection import db
+import csv
+import re
+from bson import ObjectId
+from bson.errors import InvalidId
+from .serializers import TeacherSerializer, StudentSerializer, LoginSerializer, StudentImportSerializer
+from .parsers import CSVParser, parse_csv
+from .hashing import hash_passwords
+from db_connection import db, duplicate_key_field
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from rest_framework.parsers import JSONParser, MultiPartParser
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.authtoken.models import Token
-from .models import BaseUser
-import jwt
+from .models import search_keys, PRIVATE_FIELDS_PROJECTION
+from .authentication import JWTAuthentication
 from django.conf import settings
 
 from rest_framework.permissions import IsAuthenticated
@@ -15,30 +22,24 @@ class TeacherListCreateView(APIView):
     Handles listing all teachers and creating a new teacher.
     """
     def get(self, request, format=None):
-        teachers = list(db["teachers"].find({}, {"_id": 0}))  # Avoid returning MongoDB _id field
+        teachers = list(db["teachers"].find({}, PRIVATE_FIELDS_PROJECTION))  # Avoid returning _id and password hashes
         return Response(teachers, status=status.HTTP_200_OK)
 
     def post(self, request, format=None):
         serializer = TeacherSerializer(data=request.data)
         if serializer.is_valid():
             teacher_data = serializer.validated_data
-
-            # Check for duplicates in email or employee ID
-            duplicate_email = db["teachers"].find_one({"email": teacher_data["email"]})
-            duplicate_employee_id = db["teachers"].find_one({"employeeID": teacher_data["employeeID"]})
-
-            if duplicate_email:
-                return Response(
-                    {"error": "A teacher with this email already exists.", "data": duplicate_email},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            if duplicate_employee_id:
-                return Response(
-                    {"error": "A teacher with this employee ID already exists.", "data": duplicate_employee_id},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            db["teachers"].insert_one(teacher_data)  # Save the teacher
+            teacher_data["searchKeys"] = search_keys(teacher_data)
+
+            # Duplicate email / employee ID are rejected by the unique indexes
+            try:
+                db["teachers"].insert_one(teacher_data)  # Save the teacher
+            except DuplicateKeyError as e:
+                if duplicate_key_field(e) == "employeeID":
+                    message = "A teacher with this employee ID already exists."
+                else:
+                    message = "A teacher with this email already exists."
+                return Response({"error": message}, status=status.HTTP_400_BAD_REQUEST)
             return Response(
                 {
                     "message": "Teacher account created successfully.",
@@ -49,12 +50,98 @@ class TeacherListCreateView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class DirectorySearchView(APIView):
+    """
+    Prefix/typeahead search over one account directory, e.g.
+    GET /students/search/?q=ann&department=CS&limit=20&after=<cursor>.
+    """
+    collection_name = None
+    filter_fields = ()
+    default_page_size = 20
+
+    def get(self, request, format=None):
+        query = {}
+        term = request.query_params.get("q", "").strip().lower()
+        if term:
+            # Anchored prefix on searchKeys (name words, email, enrollment/employee ID), matched on the
+            # (filter, _id, searchKeys) index keys while the index walks _id order
+            query["searchKeys"] = {"$regex": "^" + re.escape(term)}
+        for field in self.filter_fields:
+            value = request.query_params.get(field)
+            if value:
+                query[field] = value
+
+        try:
+            limit = int(request.query_params.get("limit", self.default_page_size))
+            after = request.query_params.get("after")
+            if after:
+                query["_id"] = {"$gt": ObjectId(after)}
+        except (ValueError, InvalidId):
+            return Response({"error": "Invalid limit or cursor."}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, settings.DIRECTORY_SEARCH["max_page_size"]))
+
+        # _id is only fetched to build the next cursor
+        projection = {k: v for k, v in PRIVATE_FIELDS_PROJECTION.items() if k != "_id"}
+        results = list(db[self.collection_name].find(query, projection).sort("_id", 1).limit(limit + 1))
+        next_cursor = str(results[limit - 1]["_id"]) if len(results) > limit else None
+        results = results[:limit]
+        for account in results:
+            del account["_id"]
+        return Response({"results": results, "next": next_cursor}, status=status.HTTP_200_OK)
+
+
+class TeacherSearchView(DirectorySearchView):
+    collection_name = "teachers"
+
+
+class StudentSearchView(DirectorySearchView):
+    collection_name = "students"
+    filter_fields = ("department", "classID")
+
+
+class ClassRosterView(APIView):
+    """
+    Students of a class and the class's learning paths with their progress:
+    GET /students/roster/?classID=<id>&limit=50&after=<cursor>. The paths belong
+    to the class, so they are read once and returned next to the page of students.
+    """
+    default_page_size = 50
+    max_page_size = 200
+    student_projection = {"name": 1, "email": 1, "enrollmentNumber": 1, "department": 1, "classID": 1}
+    path_projection = {"title": 1, "progress": 1, "completedTopics": 1, "totalTopics": 1}
+
+    def get(self, request, format=None):
+        class_id = request.query_params.get("classID")
+        if not class_id:
+            return Response({"error": "classID is required."}, status=status.HTTP_400_BAD_REQUEST)
+        query = {"classID": class_id}
+        try:
+            limit = int(request.query_params.get("limit", self.default_page_size))
+            after = request.query_params.get("after")
+            if after:
+                query["_id"] = {"$gt": ObjectId(after)}
+        except (ValueError, InvalidId):
+            return Response({"error": "Invalid limit or cursor."}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, self.max_page_size))
+
+        # Served by the classID_id_searchKeys index in _id order
+        students = list(db["students"].find(query, self.student_projection).sort("_id", 1).limit(limit + 1))
+        next_cursor = str(students[limit - 1]["_id"]) if len(students) > limit else None
+        students = students[:limit]
+        for student in students:
+            del student["_id"]
+        # Served by the learning_paths classID index
+        learning_paths = list(db["learning_paths"].find({"classID": class_id}, self.path_projection).sort("_id", 1))
+        return Response({"classID": class_id, "learningPaths": learning_paths, "results": students,
+                         "next": next_cursor}, status=status.HTTP_200_OK)
+
+
 class TeacherDetailView(APIView):
     """
     Handles retrieving, updating, and deleting a single teacher.
     """
     def get(self, request, teacher_email, format=None):
-        teacher = db["teachers"].find_one({"email": teacher_email}, {"_id": 0})
+        teacher = db["teachers"].find_one({"email": teacher_email}, PRIVATE_FIELDS_PROJECTION)
         if teacher:
             return Response(teacher, status=status.HTTP_200_OK)
         return Response({"detail": "Teacher not found."}, status=status.HTTP_404_NOT_FOUND)
@@ -67,7 +154,14 @@ class TeacherDetailView(APIView):
         serializer = TeacherSerializer(data=request.data)
         if serializer.is_valid():
             updated_teacher = serializer.validated_data
-            db["teachers"].update_one({"email": teacher_email}, {"$set": updated_teacher})
+            try:
+                db["teachers"].update_one({"email": teacher_email},
+                                          {"$set": {**updated_teacher, "searchKeys": search_keys(updated_teacher)}})
+            except DuplicateKeyError as e:
+                return Response(
+                    {"error": f"Another teacher already uses this {duplicate_key_field(e) or 'email'}."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
             return Response(updated_teacher, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -83,32 +177,24 @@ class StudentListCreateView(APIView):
     Handles listing all students and creating a new student.
     """
     def get(self, request, format=None):
-        students = list(db["students"].find({}, {"_id": 0}))  # Avoid returning MongoDB _id field
+        students = list(db["students"].find({}, PRIVATE_FIELDS_PROJECTION))  # Avoid returning _id and password hashes
         return Response(students, status=status.HTTP_200_OK)
 
     def post(self, request, format=None):
         serializer = StudentSerializer(data=request.data)
         if serializer.is_valid():
             student_data = serializer.validated_data
-
-            # Check for duplicates in email or enrollment number
-            duplicate_email = db["students"].find_one({"email": student_data["email"]})
-            duplicate_enrollment_number = db["students"].find_one({"enrollmentNumber": student_data["enrollmentNumber"]})
-
-            if duplicate_email:
-                return Response(
-                    {"error": "A student with this email already exists.", "data": duplicate_email},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            if duplicate_enrollment_number:
-                return Response(
-                    {"error": "A student with this enrollment number already exists.", "data": duplicate_enrollment_number},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            
-
-            db["students"].insert_one(student_data)  # Save the student
+            student_data["searchKeys"] = search_keys(student_data)
+
+            # Duplicate email / enrollment number are rejected by the unique indexes
+            try:
+                db["students"].insert_one(student_data)  # Save the student
+            except DuplicateKeyError as e:
+                if duplicate_key_field(e) == "enrollmentNumber":
+                    message = "A student with this enrollment number already exists."
+                else:
+                    message = "A student with this email already exists."
+                return Response({"error": message}, status=status.HTTP_400_BAD_REQUEST)
             return Response(
                 {
                     "message": "Student account created successfully.",
@@ -119,12 +205,91 @@ class StudentListCreateView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class StudentBulkImportView(APIView):
+    """
+    Imports a roster of students from a CSV file or a JSON array in one request
+    and reports the outcome of every row.
+    """
+    parser_classes = [JSONParser, CSVParser, MultiPartParser]
+    chunk_size = 500
+    max_rows = 10000
+
+    def post(self, request, format=None):
+        try:
+            rows = parse_csv(request.FILES["file"]) if "file" in request.FILES else request.data
+        except (UnicodeDecodeError, csv.Error) as e:
+            return Response({"error": f"CSV parse error - {e}"}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(rows, list):
+            return Response({"error": "Expected a CSV file or a JSON array of students."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > self.max_rows:
+            return Response({"error": f"At most {self.max_rows} students can be imported at once."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        report = [None] * len(rows)
+
+        def fail(index, errors):
+            report[index] = {"row": index + 1, "status": "error", "errors": errors}
+
+        # Field validation for every row in one pass, without touching the database
+        valid = []
+        for index, row in enumerate(rows):
+            serializer = StudentImportSerializer(data=row)
+            if serializer.is_valid():
+                valid.append((index, dict(serializer.validated_data)))
+            else:
+                fail(index, serializer.errors)
+
+        # One $in query per unique key, plus duplicates inside the upload itself
+        taken_emails = {doc["email"] for doc in db["students"].find(
+            {"email": {"$in": [data["email"] for _, data in valid]}}, {"_id": 0, "email": 1})}
+        taken_enrollments = {doc["enrollmentNumber"] for doc in db["students"].find(
+            {"enrollmentNumber": {"$in": [data["enrollmentNumber"] for _, data in valid]}}, {"_id": 0, "enrollmentNumber": 1})}
+        to_insert = []
+        for index, data in valid:
+            errors = {}
+            if data["email"] in taken_emails:
+                errors["email"] = ["A student with this email already exists."]
+            if data["enrollmentNumber"] in taken_enrollments:
+                errors["enrollmentNumber"] = ["A student with this enrollment number already exists."]
+            taken_emails.add(data["email"])
+            taken_enrollments.add(data["enrollmentNumber"])
+            if errors:
+                fail(index, errors)
+            else:
+                data["searchKeys"] = search_keys(data)
+                to_insert.append((index, data))
+
+        plain = [(index, data) for index, data in to_insert if not data["password"].startswith('pbkdf2')]
+        for (index, data), hashed in zip(plain, hash_passwords([data["password"] for _, data in plain])):
+            data["password"] = hashed
+
+        for start in range(0, len(to_insert), self.chunk_size):
+            chunk = to_insert[start:start + self.chunk_size]
+            failed = {}
+            try:
+                # Unordered so one bad document does not stop the rest of the chunk
+                db["students"].insert_many([data for _, data in chunk], ordered=False)
+            except BulkWriteError as e:
+                failed = {error["index"]: error for error in e.details.get("writeErrors", [])}
+            for position, (index, data) in enumerate(chunk):
+                if position in failed:
+                    fail(index, {"non_field_errors": [failed[position].get("errmsg", "Insert failed.")]})
+                else:
+                    report[index] = {"row": index + 1, "status": "created", "email": data["email"]}
+
+        created = sum(1 for entry in report if entry["status"] == "created")
+        return Response(
+            {"created": created, "failed": len(rows) - created, "rows": report},
+            status=status.HTTP_201_CREATED if created == len(rows) else status.HTTP_207_MULTI_STATUS
+        )
+
+
 class StudentDetailView(APIView):
     """
     Handles retrieving, updating, and deleting a single student.
     """
     def get(self, request, student_email, format=None):
-        student = db["students"].find_one({"email": student_email}, {"_id": 0})
+        student = db["students"].find_one({"email": student_email}, PRIVATE_FIELDS_PROJECTION)
         if student:
             return Response(student, status=status.HTTP_200_OK)
         return Response({"detail": "Student not found."}, status=status.HTTP_404_NOT_FOUND)
@@ -137,7 +302,14 @@ class StudentDetailView(APIView):
         serializer = StudentSerializer(data=request.data)
         if serializer.is_valid():
             updated_student = serializer.validated_data
-            db["students"].update_one({"email": student_email}, {"$set": updated_student})
+            try:
+                db["students"].update_one({"email": student_email},
+                                          {"$set": {**updated_student, "searchKeys": search_keys(updated_student)}})
+            except DuplicateKeyError as e:
+                return Response(
+                    {"error": f"Another student already uses this {duplicate_key_field(e) or 'email'}."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
             return Response(updated_student, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -183,27 +355,13 @@ class LoginView(APIView):
 
 
 class UpdateClassIDView(APIView):
-    def get_user_from_token(self, request):
-        """Extracts and decodes JWT token manually."""
-        auth_header = request.headers.get("Authorization", None)
-        if not auth_header:
-            return None, Response({"error": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED)
-
-        try:
-            token = auth_header.split(" ")[1]  # Extract token after 'Bearer'
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-            return payload, None  # Return payload data if valid
-        except jwt.ExpiredSignatureError:
-            return None, Response({"error": "Token has expired."}, status=status.HTTP_401_UNAUTHORIZED)
-        except jwt.InvalidTokenError:
-            return None, Response({"error": "Invalid token."}, status=status.HTTP_401_UNAUTHORIZED)
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
 
     def post(self, request, format=None):
         """Updates the student's classID if valid."""
-        # Decode user from JWT
-        payload, error_response = self.get_user_from_token(request)
-        if error_response:
-            return error_response  # Return authentication error
+        # Claims of the verified JWT
+        payload = request.auth
 
         student_email = payload.get("email")  # Get student email from token
         if not student_email: